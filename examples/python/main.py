@@ -1,38 +1,69 @@
+import os
+import sys
+import argparse
+import threading
+import binascii
+import functools
+import multiprocessing
+from hmac import compare_digest
 from pathlib import Path
-from termcolor import colored
-from utils import MLKEM512, MLKEM768, MLKEM1024, MLDSA44, MLDSA65, MLDSA87, Falcon512, Falcon1024
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from utils import get_binary_path, MLKEM512, MLKEM768, MLKEM1024, MLDSA44, MLDSA65, MLDSA87, Falcon512, Falcon1024
 
 METADATA_URL = "https://github.com/QudsLab/PQChub/raw/refs/heads/main/bins/binaries.json"
 CACHE_DIR = Path("download_cache")
 EXP_DIR = Path("test_output")
+# Hex copies of the binary artifacts are only written when PQCHUB_WRITE_HEX=1
+WRITE_HEX = os.environ.get("PQCHUB_WRITE_HEX", "0") == "1"
+# ANSI color prefixes for log lines, disabled when NO_COLOR is set
+C = {"cyan": "\x1b[36m", "blue": "\x1b[34m", "yellow": "\x1b[33m", "green": "\x1b[32m", "red": "\x1b[31m", "white": "\x1b[37m"}
+R = "\x1b[0m"
+if "NO_COLOR" in os.environ:
+    C = dict.fromkeys(C, "")
+    R = ""
 
-print(colored("="*60, "cyan"))
-print(colored(f"PQC Algorithm Binary path is {CACHE_DIR}", "cyan"))
-print(colored("="*60, "cyan"))
+@functools.lru_cache(maxsize=None)
+def get_backend(algo_class):
+    # One instance per algorithm class, so repeated tests reuse the loaded library
+    return algo_class(METADATA_URL, CACHE_DIR)
 
-def write_file(name, contentType, content):
-    exp_path = EXP_DIR / name
-    exp_bin_path = EXP_DIR / name / 'bin'
-    exp_path.mkdir(parents=True, exist_ok=True)
-    exp_bin_path.mkdir(parents=True, exist_ok=True)
-    
+def _prefetch():
+    try:
+        get_binary_path(METADATA_URL, CACHE_DIR)
+    except Exception:
+        pass  # reported by each test when its backend fails to load
+
+def _write(path, data):
+    # Every artifact is written in a single call, so skip the BufferedWriter copy
+    with open(path, "wb", buffering=0) as f:
+        f.write(data)
+
+def write_file(exp_dir, exp_bin_dir, contentType, content, text=False):
+    # Output directories already exist, see the __main__ block. Paths are plain strings
+    # computed once per algorithm, so no Path objects are built per artifact
+    # Save bytes that already hold UTF-8 text as-is, without a decode/encode round trip
+    if text:
+        _write(f"{exp_dir}{os.sep}{contentType}.txt", content)
     # Save binary version if content is bytes
-    if isinstance(content, bytes):
-        bin_file = exp_bin_path / f"{contentType}.bin"
-        with open(bin_file, "wb") as f:
-            f.write(content)
+    elif isinstance(content, bytes):
+        _write(f"{exp_bin_dir}{os.sep}{contentType}.bin", content)
         # Save hex version in text file
-        txt_file = exp_path / f"{contentType}.txt"
-        hex_content = content.hex()
-        with open(txt_file, "w", encoding="utf-8") as f:
-            f.write(hex_content)
+        if WRITE_HEX:
+            _write(f"{exp_dir}{os.sep}{contentType}.txt", binascii.hexlify(content))
     # Save only text version if content is string
     elif isinstance(content, str):
-        txt_file = exp_path / f"{contentType}.txt"
-        with open(txt_file, "w", encoding="utf-8") as f:
-            f.write(content)
+        _write(f"{exp_dir}{os.sep}{contentType}.txt", content.encode("utf-8"))
+
+def _skipped(name, lines, error):
+    # The library couldn't be loaded, so the algorithm is skipped before any artifact is written
+    lines.append(f"{C['red']}Skipped: failed to load {name} - {error}{R}")
+    lines.append(f"{C['white']}Test of {name} algorithm ended\n{R}")
+    return "\n".join(lines) + "\n"
 
 def test_kem(name, kem_class, secret_message):
+    # output directories are created up front by the main process
+    exp_dir = os.path.join(EXP_DIR, name)
+    exp_bin_dir = os.path.join(exp_dir, 'bin')
     msg_file       = "message"
     pk_file        = "public_key"
     sk_file        = "secret_key"
@@ -42,66 +73,135 @@ def test_kem(name, kem_class, secret_message):
     encrypted_file = "encrypted_message"
     decrypted_file = "decrypted_message"
     
-    write_file(name, "message", secret_message.decode())
-    print(colored(f"Starting test of {name} algorithm, creating pk,sk", "blue"))
-    kem = kem_class(METADATA_URL, CACHE_DIR)
+    lines = [f"{C['blue']}Starting test of {name} algorithm, creating pk,sk{R}"]
+    try:
+        kem = get_backend(kem_class)
+    except Exception as e:
+        return _skipped(name, lines, e)
+    write_file(exp_dir, exp_bin_dir, "message", secret_message, text=True)
     pk, sk = kem.keypair()
-    write_file(name, "public_key", pk)
-    write_file(name, "secret_key", sk)
+    write_file(exp_dir, exp_bin_dir, "public_key", pk)
+    write_file(exp_dir, exp_bin_dir, "secret_key", sk)
     ct, ss1 = kem.encapsulate(pk)
-    write_file(name, "ciphertext", ct)
-    write_file(name, "shared_secret_1", ss1)
-    print(colored(f"pk length: {len(pk)}, sk length: {len(sk)}, encrypted msg length: {len(ct)}", "yellow"))
+    write_file(exp_dir, exp_bin_dir, "ciphertext", ct)
+    write_file(exp_dir, exp_bin_dir, "shared_secret_1", ss1)
+    lpk, lsk, lct = len(pk), len(sk), len(ct)
+    lines.append(f"{C['yellow']}pk length: {lpk}, sk length: {lsk}, encrypted msg length: {lct}{R}")
     ss2 = kem.decapsulate(ct, sk)
-    write_file(name, "shared_secret_2", ss2)
-    result = "SUCCESS" if ss1 == ss2 else "FAILED"
-    print(colored(f"Decryption result: {result} (shared secret matched: {ss1 == ss2})", "green"))
-    print(colored(f"Test of {name} algorithm ended\n", "white"))
+    write_file(exp_dir, exp_bin_dir, "shared_secret_2", ss2)
+    matched = compare_digest(ss1, ss2)
+    result = "SUCCESS" if matched else "FAILED"
+    lines.append(f"{C['green']}Decryption result: {result} (shared secret matched: {matched}){R}")
+    lines.append(f"{C['white']}Test of {name} algorithm ended\n{R}")
+    return "\n".join(lines) + "\n"
 
 def test_signature(name, sig_class, secret_message):
-    # create output directory for this algorithm
-    exp_path = EXP_DIR / name
-    exp_path.mkdir(parents=True, exist_ok=True)
+    # output directories are created up front by the main process
+    exp_dir = os.path.join(EXP_DIR, name)
+    exp_bin_dir = os.path.join(exp_dir, 'bin')
     msg_file       = "message"
     pk_file        = "public_key"
     sk_file        = "secret_key"
     encrypted_file = "encrypted_message"
     decrypted_file = "decrypted_message"
     
-    write_file(name, "message", secret_message.decode())
+    lines = [f"{C['blue']}Starting test of {name} algorithm, creating pk,sk{R}"]
+    try:
+        sig = get_backend(sig_class)
+    except Exception as e:
+        return _skipped(name, lines, e)
+    write_file(exp_dir, exp_bin_dir, "message", secret_message, text=True)
     
     try:
-        print(colored(f"Starting test of {name} algorithm, creating pk,sk", "blue"))
-        sig = sig_class(METADATA_URL, CACHE_DIR)
         pk, sk = sig.keypair()
-        write_file(name, "public_key", pk)
-        write_file(name, "secret_key", sk)
+        write_file(exp_dir, exp_bin_dir, "public_key", pk)
+        write_file(exp_dir, exp_bin_dir, "secret_key", sk)
         signed = sig.sign(secret_message, sk)
-        write_file(name, "encrypted_message", signed)
-        print(colored(f"pk length: {len(pk)}, sk length: {len(sk)}, signed msg length: {len(signed)}", "yellow"))
+        write_file(exp_dir, exp_bin_dir, "encrypted_message", signed)
+        lpk, lsk, lsigned = len(pk), len(sk), len(signed)
+        lines.append(f"{C['yellow']}pk length: {lpk}, sk length: {lsk}, signed msg length: {lsigned}{R}")
         verified = sig.verify(signed, pk)
-        write_file(name, "decrypted_message", verified)
-        result = "SUCCESS" if verified == secret_message else "FAILED"
-        print(colored(f"Verification result: {result} (message matched: {verified == secret_message})", "green"))
-        print(colored(f"Test of {name} algorithm ended\n", "white"))
+        write_file(exp_dir, exp_bin_dir, "decrypted_message", verified)
+        matched = compare_digest(verified, secret_message)
+        result = "SUCCESS" if matched else "FAILED"
+        lines.append(f"{C['green']}Verification result: {result} (message matched: {matched}){R}")
+        lines.append(f"{C['white']}Test of {name} algorithm ended\n{R}")
     except Exception as e:
-        print(colored(f"pk length: N/A, sk length: N/A, signed msg length: N/A", "yellow"))
-        print(colored(f"Verification result: FAILED - {str(e)}", "red"))
-        print(colored(f"Test of {name} algorithm ended\n", "white"))
+        lines.append(f"{C['yellow']}pk length: N/A, sk length: N/A, signed msg length: N/A{R}")
+        lines.append(f"{C['red']}Verification result: FAILED - {str(e)}{R}")
+        lines.append(f"{C['white']}Test of {name} algorithm ended\n{R}")
+    return "\n".join(lines) + "\n"
+
+TESTS = {"kem": test_kem, "sig": test_signature}
+SUITE = [
+    ("kem", "ML-KEM-512",   MLKEM512),
+    ("kem", "ML-KEM-768",   MLKEM768),
+    ("kem", "ML-KEM-1024", MLKEM1024),
+    ("sig", "ML-DSA-44",     MLDSA44),
+    ("sig", "ML-DSA-65",     MLDSA65),
+    ("sig", "ML-DSA-87",     MLDSA87),
+    ("sig", "Falcon-512",  Falcon512),
+    ("sig", "Falcon-1024", Falcon1024),
+]
+
+# Rough relative runtime of each test (Falcon key generation dominates), used to start the
+# slowest jobs first so a short job never ends up last on the critical path
+COST = {
+    "Falcon-1024": 8, "Falcon-512": 7,
+    "ML-DSA-87": 6, "ML-DSA-65": 5, "ML-DSA-44": 4,
+    "ML-KEM-1024": 3, "ML-KEM-768": 2, "ML-KEM-512": 1,
+}
+
+def _run(job):
+    # Runs one algorithm test in a worker process; each test returns its whole log block
+    # as one string so the output of parallel jobs doesn't interleave on stdout
+    kind, name, algo_class, secret_message = job
+    return TESTS[kind](name, algo_class, secret_message)
+
+if __name__ == "__main__":
+    # Resolve (and on a cold cache download) the shared library in the background, so the
+    # network round trips overlap argument parsing and output directory setup
+    prefetch = threading.Thread(target=_prefetch, daemon=True)
+    prefetch.start()
+    parser = argparse.ArgumentParser(description="Test the PQC algorithm binaries")
+    parser.add_argument("algorithms", nargs="*", metavar="PREFIX",
+                        help="only test algorithms whose name starts with one of these prefixes (e.g. ML-KEM Falcon-512)")
+    args = parser.parse_args()
+    suite = [entry for entry in SUITE if not args.algorithms or entry[1].startswith(tuple(args.algorithms))]
+    if not suite:
+        parser.error(f"no algorithm matches {', '.join(args.algorithms)}")
 
-secret_message = b"This is a secret message for PQC testing!"
-print(colored(f"Secret message: {secret_message.decode()}", "red"))
-print()
+    rule = f"{C['cyan']}{'='*60}{R}"
+    secret_message = b"This is a secret message for PQC testing!"
+    sys.stdout.write(f"{rule}\n{C['cyan']}PQC Algorithm Binary path is {CACHE_DIR}{R}\n{rule}\n"
+                     f"{C['red']}Secret message: {secret_message.decode()}{R}\n\n")
 
-test_kem("ML-KEM-512",          MLKEM512, secret_message)
-test_kem("ML-KEM-768",          MLKEM768, secret_message)
-test_kem("ML-KEM-1024",        MLKEM1024, secret_message)
-test_signature("ML-DSA-44",      MLDSA44, secret_message)
-test_signature("ML-DSA-65",      MLDSA65, secret_message)
-test_signature("ML-DSA-87",      MLDSA87, secret_message)
-test_signature("Falcon-512",   Falcon512, secret_message)
-test_signature("Falcon-1024", Falcon1024, secret_message)
+    jobs = [(kind, name, algo_class, secret_message) for kind, name, algo_class in suite]
+    for _, name, _ in suite:
+        (EXP_DIR / name / 'bin').mkdir(parents=True, exist_ok=True)
+    prefetch.join()
+    # Load every library here once, before any worker starts. Forked workers inherit the
+    # backends copy-on-write and threads share them directly
+    for _, _, algo_class in suite:
+        try:
+            get_backend(algo_class)
+        except Exception:
+            pass  # reported by the test itself
+    # Each algorithm is independent and CPU-bound in native code, so run them side by side.
+    # Fork on Linux so workers start from this already-initialised process. macOS offers fork
+    # but it is unsafe once system frameworks are in use (urllib's proxy lookup has just run),
+    # and Windows has none; spawned workers would re-import the script and reload every
+    # library, so use threads there instead; ctypes releases the GIL for each native call
+    workers = min(len(jobs), os.cpu_count() or 1)
+    if sys.platform.startswith("linux"):
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+    with pool as executor:
+        futures = {job[1]: executor.submit(_run, job)
+                   for job in sorted(jobs, key=lambda job: COST.get(job[1], 0), reverse=True)}
+        # Results are still reported in suite order
+        for job in jobs:
+            sys.stdout.write(futures[job[1]].result())
 
-print(colored("\n" + "="*60, "cyan"))
-print(colored("All 8 PQC algorithms tested!", "green"))
-print(colored("="*60, "cyan"))
\ No newline at end of file
+    sys.stdout.write(f"{C['cyan']}\n{'='*60}{R}\n{C['green']}All {len(jobs)} PQC algorithms tested!{R}\n{rule}\n")
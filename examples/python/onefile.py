@@ -1,381 +1,543 @@
 import json
 import ctypes
+import os
+import shutil
+import hashlib
 import platform
-import urllib.request
+import functools
+import threading
+import sys
+import argparse
+import binascii
+import multiprocessing
 from pathlib import Path
-from termcolor import colored
-from .bin import get_binary_path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from hmac import compare_digest
 
 METADATA_URL = "https://github.com/QudsLab/PQChub/raw/refs/heads/main/bins/binaries.json"
 CACHE_DIR = Path("download_cache")
 EXP_DIR = Path("test_output")
+# Hex copies of the binary artifacts are only written when PQCHUB_WRITE_HEX=1
+WRITE_HEX = os.environ.get("PQCHUB_WRITE_HEX", "0") == "1"
+# ANSI color prefixes for log lines, disabled when NO_COLOR is set
+C = {"cyan": "\x1b[36m", "blue": "\x1b[34m", "yellow": "\x1b[33m", "green": "\x1b[32m", "red": "\x1b[31m", "white": "\x1b[37m"}
+R = "\x1b[0m"
+LIBRARY_SUFFIXES = (".so", ".dll", ".dylib")
 
 ## ---------------------------------------------------------------------------------------------------------------------------------------------------------
 
-def detect_platform() -> (bool, str):
-    system = platform.system().lower()
-    machine = platform.machine().lower()
-    
-    if system == "windows":
-        if "64" in machine or "amd64" in machine:
-            return (True, "windows-x64")
-        else:
-            return (True, "windows-x86")
-    elif system == "darwin":
-        if "arm" in machine or "aarch64" in machine:
-            return (True, "macos-arm64")
-        else:
-            return (True, "macos-x86_64")
-    elif system == "linux":
-        if "aarch64" in machine or "arm64" in machine:
-            return (True, "linux-aarch64")
-        else:
-            return (True, "linux-x86_64")
-    else:
-        raise (False, f"Unsupported platform: {system} {machine}")
-def download_file(url, dest_path) -> (bool, str):
+# system -> (machine substrings of the first variant, first variant, fallback variant)
+_PLATFORMS = {
+    "windows": (("64",), "windows-x64", "windows-x86"),
+    "darwin": (("arm", "aarch64"), "macos-arm64", "macos-x86_64"),
+    "linux": (("aarch64", "arm64"), "linux-aarch64", "linux-x86_64"),
+}
+
+@functools.lru_cache(maxsize=1)
+def detect_platform() -> str:
+    uname = platform.uname()
+    system = uname.system.lower()
+    machine = uname.machine.lower()
+    if system not in _PLATFORMS:
+        raise Exception(f"Unsupported platform: {system} {machine}")
+    markers, matched, fallback = _PLATFORMS[system]
+    return matched if any(m in machine for m in markers) else fallback
+
+# macOS sysctls for the CPU features the AVX2 builds rely on; every SSE4.2 CPU has POPCNT
+_MACOS_SYSCTLS = {"avx2": b"hw.optional.avx2_0", "bmi2": b"hw.optional.bmi2",
+                  "fma": b"hw.optional.fma", "popcnt": b"hw.optional.sse4_2"}
+
+def _windows_cpu_flags() -> frozenset:
+    # Assumes BMI2, POPCNT and FMA whenever AVX2 is present: Windows has no feature to query for
+    # them, and every AVX2 CPU (Intel Haswell, AMD Excavator and later) has all three.
+    # 40 is PF_AVX2_INSTRUCTIONS_AVAILABLE
+    if ctypes.windll.kernel32.IsProcessorFeaturePresent(40):
+        return frozenset(("avx2", "bmi2", "popcnt", "fma"))
+    return frozenset()
+def _macos_cpu_flags() -> frozenset:
+    libc = ctypes.CDLL(None)
+    flags = set()
+    for flag, name in _MACOS_SYSCTLS.items():
+        # Unknown names (e.g. on Apple silicon) fail, which leaves the flag out
+        value, size = ctypes.c_int(0), ctypes.c_size_t(ctypes.sizeof(ctypes.c_int))
+        if libc.sysctlbyname(name, ctypes.byref(value), ctypes.byref(size), None, 0) == 0 and value.value:
+            flags.add(flag)
+    return frozenset(flags)
+@functools.lru_cache(maxsize=1)
+def detect_cpu_flags() -> frozenset:
+    # Windows and macOS are asked through their system APIs; Linux lists the flags in /proc/cpuinfo
+    system = platform.system()
+    if system == "Windows":
+        return _windows_cpu_flags()
+    if system == "Darwin":
+        return _macos_cpu_flags()
     try:
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-        urllib.request.urlretrieve(url, dest_path)
-        return (True, "Download successful")
-    except Exception as e:
-        return (False, str(e))
-def get_binary_path(metadata_url, cache_dir) -> (bool, bool, str):
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return frozenset(line.partition(":")[2].split())
+    except OSError:
+        pass
+    return frozenset()
+def download_file(url, dest_path, sha256=None) -> None:
+    # The HTTP stack is imported on first use; a run with a warm cache never needs it
+    import urllib.error
+    import urllib.request
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    # Stream in large chunks into a temporary file and move it into place once complete,
+    # so an interrupted download never leaves a truncated library in the cache
+    tmp_path = f"{dest_path}.part"
+    # A .part file left by an interrupted run is resumed with a Range request
+    offset = os.path.getsize(tmp_path) if os.path.isfile(tmp_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
     try:
-        platform_status, platform_id = detect_platform()
-        if platform_status:
-            with urllib.request.urlopen(metadata_url) as response:
-                metadata = json.loads(response.read().decode('utf-8'))
-            if platform_id in metadata['binaries']:
-                binary_info = metadata['binaries'][platform_id]
-                binary_url = binary_info['url']
-                binary_filename = binary_info['filename']
-                cached_path = cache_dir / platform_id / binary_filename
-                if cached_path.exists():
-                    return (True, False, str(cached_path))
-                else:
-                    download_file(binary_url, cached_path)
-                    return (True, True, str(cached_path))
-    except Exception as e:
-        return (False, False, str(e))
-    return (False, False, "Unsupported platform")
+        response = urllib.request.urlopen(urllib.request.Request(url, headers=headers))
+    except urllib.error.HTTPError as e:
+        if e.code != 416:
+            raise
+        # The range lies beyond the file, so the .part file can't be trusted; start over
+        e.close()
+        offset = 0
+        response = urllib.request.urlopen(url)
+    with response, open(tmp_path, 'ab' if offset and response.status == 206 else 'wb') as f:
+        shutil.copyfileobj(response, f, length=1 << 18)
+    # Only a download matching the published checksum is moved into the cache
+    if sha256 is not None:
+        with open(tmp_path, 'rb') as f:
+            if hasattr(hashlib, "file_digest"):
+                # Python 3.11+: hashed straight from the file in C, no Python-level read loop
+                digest = hashlib.file_digest(f, "sha256")
+            else:
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        if digest.hexdigest() != sha256.lower():
+            os.remove(tmp_path)
+            raise Exception(f"Checksum mismatch for {url}")
+    os.replace(tmp_path, dest_path)
+@functools.lru_cache(maxsize=None)
+def fetch_metadata(metadata_url) -> dict:
+    import urllib.request
+    # Parsed once per process; every algorithm class resolves its binary from the same metadata
+    with urllib.request.urlopen(metadata_url) as response:
+        return json.loads(response.read().decode('utf-8'))
+@functools.lru_cache(maxsize=None)
+def get_binary_path(metadata_url, cache_dir) -> str:
+    platform_id = detect_platform()
+    # A library already in the platform cache is used as-is, without fetching binaries.json
+    platform_dir = os.path.join(cache_dir, platform_id)
+    if os.path.isdir(platform_dir):
+        with os.scandir(platform_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(LIBRARY_SUFFIXES) and entry.is_file():
+                    return entry.path
+    metadata = fetch_metadata(metadata_url)
+    if platform_id not in metadata['binaries']:
+        raise Exception(f"No binary published for {platform_id}")
+    binary_info = metadata['binaries'][platform_id]
+    cached_path = os.path.join(platform_dir, binary_info['filename'])
+    if not os.path.isfile(cached_path):
+        download_file(binary_info['url'], cached_path, binary_info.get('checksums', {}).get('sha256'))
+    return cached_path
 
 ## ---------------------------------------------------------------------------------------------------------------------------------------------------------
 
+_UBP = ctypes.POINTER(ctypes.c_ubyte)
+# PQClean takes message and signature lengths as size_t (4 bytes on 32-bit platforms)
+_SZ = ctypes.c_size_t
+_SZP = ctypes.POINTER(ctypes.c_size_t)
+_byref = ctypes.byref
+_string_at = ctypes.string_at
+_memset = ctypes.memset
+_setup_lock = threading.Lock()
+# Optimised PQClean implementations, fastest first, with the CPU flags each one needs.
+# A class uses the first one its library exports and the CPU supports, else CLEAN
+_IMPLEMENTATIONS = (
+    # The AVX2 objects are also compiled with -mbmi2 -mpopcnt -mfma
+    ("AVX2", ("avx2", "bmi2", "popcnt", "fma")),
+)
+
+def _readonly(data, zerocopy=False):
+    # PQClean only reads its input buffers, so bytes are passed as c_char_p and ctypes hands C
+    # a pointer to their contents without copying; other buffer types are converted once
+    if type(data) is bytes:
+        return data
+    if zerocopy and isinstance(data, (bytearray, memoryview)):
+        view = memoryview(data)
+        if not view.readonly and view.c_contiguous:
+            # Aliases the caller's writable buffer, which must not change during the call. The
+            # byte view makes the length count bytes rather than items (e.g. array('I') views)
+            view = view.cast("B")
+            return (ctypes.c_char * view.nbytes).from_buffer(view)
+    return bytes(data)
+
+def _secret_key(sk):
+    # A secret key in a writable buffer (e.g. a bytearray the caller wipes later) is always
+    # passed in place, so no unwiped copy of it is left behind for the garbage collector
+    return _readonly(sk, zerocopy=True)
+
+def _take_secret(buf):
+    # Copies a secret key or shared secret out of a reused buffer and clears the buffer with one
+    # C memset, so the secret doesn't linger in it until the next call overwrites it
+    secret = bytes(buf)
+    _memset(buf, 0, len(buf))
+    return secret
+
+def _wipe(data):
+    # Clears a bytearray of secrets in place, also with one C memset
+    _memset((ctypes.c_char * len(data)).from_buffer(data), 0, len(data))
+
+@functools.lru_cache(maxsize=1)
+def _executor():
+    # Shared by every *_async method and created on first use. Native calls run without the
+    # GIL and output buffers are per thread, so the workers sign and verify in parallel
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+@functools.lru_cache(maxsize=None)
 def load_library(metadata_url, cache_dir):
-    success, is_new, binary_path = get_binary_path(metadata_url, cache_dir)
-    if success and binary_path:
-        return ctypes.CDLL(str(binary_path))
-    raise Exception(f"Failed to load library: {binary_path}")
+    try:
+        binary_path = get_binary_path(metadata_url, cache_dir)
+    except Exception as e:
+        raise Exception(f"Failed to load library: {e}") from e
+    return ctypes.CDLL(binary_path)
 
-class MLKEM512:
-    PUBLICKEY_BYTES = 800
-    SECRETKEY_BYTES = 1632
-    CIPHERTEXT_BYTES = 768
-    SHAREDSECRET_BYTES = 32
+# Output buffers are allocated once per instance and thread and reused by every call;
+# results are copied out as bytes, so the buffers never escape
+class _Buffers(threading.local):
+    def __init__(self):
+        # Length out-parameter of crypto_sign/crypto_sign_open, reused like the buffers
+        self.length = _SZ()
+    def get(self, name, size):
+        buf = self.__dict__.get(name)
+        if buf is None:
+            buf = self.__dict__[name] = (ctypes.c_ubyte * size)()
+        elif len(buf) < size:
+            # Grow geometrically so a run of ever longer messages reallocates only O(log n) times
+            buf = self.__dict__[name] = (ctypes.c_ubyte * max(size, 2 * len(buf)))()
+        return buf
+
+# Every algorithm of a kind exposes the same PQClean API under its own symbol prefix, so the
+# wrappers only differ in PREFIX and the byte sizes
+class _PQCBase:
+    PREFIX = None
+    # (attribute, PQClean function name, argtypes) for every function the wrapper calls
+    _PROTOS = ()
     def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_enc.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_enc.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_dec.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_dec.restype = ctypes.c_int
+        binding = type(self).__dict__.get("_bindings", {}).get((metadata_url, cache_dir))
+        if binding is None:
+            binding = self._bind(metadata_url, cache_dir)
+        self.lib, functions = binding
+        self.__dict__.update(functions)
+        self._buffers = _Buffers()
+    @classmethod
+    def _bind(cls, metadata_url, cache_dir):
+        # Library and prototypes are set up once per class and (metadata_url, cache_dir); later
+        # instances with the same arguments share them, so a different cache_dir gets its own
+        # library. The lock keeps threads constructing the same class from configuring it twice
+        key = (metadata_url, cache_dir)
+        with _setup_lock:
+            bindings = cls.__dict__.get("_bindings")
+            if bindings is None:
+                bindings = {}
+                cls._bindings = bindings
+            if key in bindings:
+                return bindings[key]
+            lib = load_library(metadata_url, cache_dir)
+            prefix = cls.PREFIX
+            flags = detect_cpu_flags()
+            for impl, required in _IMPLEMENTATIONS:
+                candidate = cls.PREFIX.replace("_CLEAN", f"_{impl}")
+                if flags.issuperset(required) and hasattr(lib, f"{candidate}_{cls._PROTOS[0][1]}"):
+                    prefix = candidate
+                    break
+            functions = {}
+            for attr, name, argtypes in cls._PROTOS:
+                fn = getattr(lib, f"{prefix}_{name}")
+                fn.argtypes = argtypes
+                fn.restype = ctypes.c_int
+                functions[attr] = fn
+            bindings[key] = (lib, functions)
+            return bindings[key]
+    def _keypair_batch(self, keypair, n):
+        # n key pairs written into two contiguous bytearrays and split afterwards, the same way
+        # as _KEM.encapsulate_batch; returns (list of public keys, list of secret keys)
+        pk_size, sk_size = self.PUBLICKEY_BYTES, self.SECRETKEY_BYTES
+        pk_type, sk_type = ctypes.c_ubyte * pk_size, ctypes.c_ubyte * sk_size
+        pks, sks = bytearray(n * pk_size), bytearray(n * sk_size)
+        try:
+            for i in range(n):
+                if keypair(pk_type.from_buffer(pks, i * pk_size), sk_type.from_buffer(sks, i * sk_size)) != 0:
+                    raise Exception("Keypair failed")
+            pk_view, sk_view = memoryview(pks), memoryview(sks)
+            return ([pk_view[i:i + pk_size].tobytes() for i in range(0, n * pk_size, pk_size)],
+                    [sk_view[i:i + sk_size].tobytes() for i in range(0, n * sk_size, sk_size)])
+        finally:
+            # The secret keys have been copied out (or the batch failed); don't leave them behind
+            _wipe(sks)
+
+class _KEM(_PQCBase):
+    _PROTOS = (
+        ("_kem_keypair", "crypto_kem_keypair", [_UBP, _UBP]),
+        ("_kem_enc", "crypto_kem_enc", [_UBP, _UBP, ctypes.c_char_p]),
+        ("_kem_dec", "crypto_kem_dec", [_UBP, ctypes.c_char_p, ctypes.c_char_p]),
+    )
     def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
+        pk = self._buffers.get("pk", self.PUBLICKEY_BYTES)
+        sk = self._buffers.get("sk", self.SECRETKEY_BYTES)
+        if self._kem_keypair(pk, sk) != 0:
+            raise Exception("Keypair failed")
+        return bytes(pk), _take_secret(sk)
+    def keypair_batch(self, n):
+        return self._keypair_batch(self._kem_keypair, n)
+    def encapsulate(self, pk, zerocopy=False):
+        ct = self._buffers.get("ct", self.CIPHERTEXT_BYTES)
+        ss = self._buffers.get("ss", self.SHAREDSECRET_BYTES)
+        pk_buf = _readonly(pk, zerocopy)
+        if self._kem_enc(ct, ss, pk_buf) != 0:
+            raise Exception("Encapsulation failed")
+        return bytes(ct), _take_secret(ss)
+    def encapsulate_batch(self, pk, n):
+        # n encapsulations against one public key, written into two contiguous bytearrays and
+        # split afterwards; returns (list of ciphertexts, list of shared secrets)
+        ct_size, ss_size = self.CIPHERTEXT_BYTES, self.SHAREDSECRET_BYTES
+        ct_type, ss_type = ctypes.c_ubyte * ct_size, ctypes.c_ubyte * ss_size
+        cts, sss = bytearray(n * ct_size), bytearray(n * ss_size)
+        pk_buf = _readonly(pk)
+        try:
+            for i in range(n):
+                if self._kem_enc(ct_type.from_buffer(cts, i * ct_size), ss_type.from_buffer(sss, i * ss_size), pk_buf) != 0:
+                    raise Exception("Encapsulation failed")
+            ct_view, ss_view = memoryview(cts), memoryview(sss)
+            return ([ct_view[i:i + ct_size].tobytes() for i in range(0, n * ct_size, ct_size)],
+                    [ss_view[i:i + ss_size].tobytes() for i in range(0, n * ss_size, ss_size)])
+        finally:
+            _wipe(sss)
+    # The *_into variants write straight into caller-owned writable buffers (e.g. bytearray)
+    # of at least the output size, with no allocation or copy-out on the Python side
+    def keypair_into(self, pk_out, sk_out):
+        pk = (ctypes.c_ubyte * self.PUBLICKEY_BYTES).from_buffer(pk_out)
+        sk = (ctypes.c_ubyte * self.SECRETKEY_BYTES).from_buffer(sk_out)
+        if self._kem_keypair(pk, sk) != 0:
             raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def encapsulate(self, pk):
-        ct = ctypes.create_string_buffer(self.CIPHERTEXT_BYTES)
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_enc(ctypes.cast(ct, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
+    def encapsulate_into(self, pk, ct_out, ss_out):
+        ct = (ctypes.c_ubyte * self.CIPHERTEXT_BYTES).from_buffer(ct_out)
+        ss = (ctypes.c_ubyte * self.SHAREDSECRET_BYTES).from_buffer(ss_out)
+        pk_buf = _readonly(pk)
+        if self._kem_enc(ct, ss, pk_buf) != 0:
             raise Exception("Encapsulation failed")
-        return bytes(ct), bytes(ss)
-    def decapsulate(self, ct, sk):
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        ct_buf = ctypes.create_string_buffer(ct)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_dec(ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ct_buf, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
+    def decapsulate(self, ct, sk, zerocopy=False):
+        ss = self._buffers.get("ss", self.SHAREDSECRET_BYTES)
+        ct_buf = _readonly(ct, zerocopy)
+        sk_buf = _secret_key(sk)
+        if self._kem_dec(ss, ct_buf, sk_buf) != 0:
             raise Exception("Decapsulation failed")
-        return bytes(ss)
+        return _take_secret(ss)
+    def decapsulate_into(self, ct, sk, ss_out):
+        # Zero-copy variant, see keypair_into
+        ss = (ctypes.c_ubyte * self.SHAREDSECRET_BYTES).from_buffer(ss_out)
+        ct_buf = _readonly(ct)
+        sk_buf = _secret_key(sk)
+        if self._kem_dec(ss, ct_buf, sk_buf) != 0:
+            raise Exception("Decapsulation failed")
+
+class _Signature(_PQCBase):
+    _PROTOS = (
+        ("_sign_keypair", "crypto_sign_keypair", [_UBP, _UBP]),
+        ("_sign", "crypto_sign", [_UBP, _SZP, ctypes.c_char_p, _SZ, ctypes.c_char_p]),
+        ("_sign_open", "crypto_sign_open", [_UBP, _SZP, ctypes.c_char_p, _SZ, ctypes.c_char_p]),
+    )
+    def keypair(self):
+        pk = self._buffers.get("pk", self.PUBLICKEY_BYTES)
+        sk = self._buffers.get("sk", self.SECRETKEY_BYTES)
+        if self._sign_keypair(pk, sk) != 0:
+            raise Exception("Keypair failed")
+        return bytes(pk), _take_secret(sk)
+    def keypair_batch(self, n):
+        return self._keypair_batch(self._sign_keypair, n)
+    def sign(self, message, sk, zerocopy=False):
+        # The length is taken once, from the converted buffer, which counts bytes for any input
+        msg_buf = _readonly(message, zerocopy)
+        msg_len = len(msg_buf)
+        sk_buf = _secret_key(sk)
+        sm = self._buffers.get("sm", msg_len + self.SIGNATURE_BYTES)
+        smlen = self._buffers.length
+        if self._sign(sm, _byref(smlen), msg_buf, msg_len, sk_buf) != 0:
+            raise Exception("Signing failed")
+        # The reported length comes from the library; never read past the buffer it was given
+        if smlen.value > len(sm):
+            raise Exception("Signing failed: signature longer than SIGNATURE_BYTES")
+        return _string_at(sm, smlen.value)
+    def sign_many(self, messages, sk):
+        # Signs every message with one secret key: lookups are hoisted out of the loop and a
+        # single signed-message buffer, sized for the longest message, is reused throughout
+        messages = [_readonly(message) for message in messages]
+        if not messages:
+            return []
+        sk_buf = _secret_key(sk)
+        sm = self._buffers.get("sm", max(map(len, messages)) + self.SIGNATURE_BYTES)
+        smlen = self._buffers.length
+        smlen_ref = _byref(smlen)
+        sign = self._sign
+        signed = []
+        for message in messages:
+            if sign(sm, smlen_ref, message, len(message), sk_buf) != 0:
+                raise Exception("Signing failed")
+            if smlen.value > len(sm):
+                raise Exception("Signing failed: signature longer than SIGNATURE_BYTES")
+            signed.append(_string_at(sm, smlen.value))
+        return signed
+    # Zero-copy variants, see _KEM.keypair_into
+    def keypair_into(self, pk_out, sk_out):
+        pk = (ctypes.c_ubyte * self.PUBLICKEY_BYTES).from_buffer(pk_out)
+        sk = (ctypes.c_ubyte * self.SECRETKEY_BYTES).from_buffer(sk_out)
+        if self._sign_keypair(pk, sk) != 0:
+            raise Exception("Keypair failed")
+    def sign_into(self, message, sk, sm_out):
+        # sm_out needs room for len(message) + SIGNATURE_BYTES; returns the signed message length
+        msg_buf = _readonly(message)
+        msg_len = len(msg_buf)
+        sk_buf = _secret_key(sk)
+        sm = (ctypes.c_ubyte * (msg_len + self.SIGNATURE_BYTES)).from_buffer(sm_out)
+        smlen = self._buffers.length
+        if self._sign(sm, _byref(smlen), msg_buf, msg_len, sk_buf) != 0:
+            raise Exception("Signing failed")
+        return smlen.value
+    def verify(self, signed_message, pk, zerocopy=False):
+        sm_buf = _readonly(signed_message, zerocopy)
+        sm_len = len(sm_buf)
+        pk_buf = _readonly(pk, zerocopy)
+        m = self._buffers.get("m", sm_len)
+        mlen = self._buffers.length
+        if self._sign_open(m, _byref(mlen), sm_buf, sm_len, pk_buf) != 0:
+            raise Exception("Verification failed")
+        if mlen.value > sm_len:
+            raise Exception("Verification failed: message longer than the signed message")
+        return _string_at(m, mlen.value)
+    def verify_only(self, signed_message, pk):
+        # True/False instead of the recovered message: the message is opened into the reused
+        # per-thread buffer and never copied out
+        sm_buf = _readonly(signed_message)
+        sm_len = len(sm_buf)
+        m = self._buffers.get("m", sm_len)
+        return self._sign_open(m, _byref(self._buffers.length), sm_buf, sm_len, _readonly(pk)) == 0
+    def verify_many(self, signed_messages, pk):
+        # Batch counterpart of verify_only and mirror of sign_many: one public key, one reused
+        # buffer sized for the longest signed message; returns a list of True/False
+        signed_messages = [_readonly(sm) for sm in signed_messages]
+        if not signed_messages:
+            return []
+        pk_buf = _readonly(pk)
+        m = self._buffers.get("m", max(map(len, signed_messages)))
+        mlen_ref = _byref(self._buffers.length)
+        sign_open = self._sign_open
+        return [sign_open(m, mlen_ref, sm, len(sm), pk_buf) == 0 for sm in signed_messages]
+    # Futures-based variants, run on the shared worker pool
+    def sign_async(self, message, sk):
+        return _executor().submit(self.sign, message, sk)
+    def verify_async(self, signed_message, pk):
+        return _executor().submit(self.verify, signed_message, pk)
+
+class MLKEM512(_KEM):
+    PREFIX = "PQCLEAN_MLKEM512_CLEAN"
+    PUBLICKEY_BYTES = 800
+    SECRETKEY_BYTES = 1632
+    CIPHERTEXT_BYTES = 768
+    SHAREDSECRET_BYTES = 32
 
-class MLKEM768:
+class MLKEM768(_KEM):
+    PREFIX = "PQCLEAN_MLKEM768_CLEAN"
     PUBLICKEY_BYTES = 1184
     SECRETKEY_BYTES = 2400
     CIPHERTEXT_BYTES = 1088
     SHAREDSECRET_BYTES = 32
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_enc.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_enc.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_dec.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_dec.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def encapsulate(self, pk):
-        ct = ctypes.create_string_buffer(self.CIPHERTEXT_BYTES)
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_enc(ctypes.cast(ct, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Encapsulation failed")
-        return bytes(ct), bytes(ss)
-    def decapsulate(self, ct, sk):
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        ct_buf = ctypes.create_string_buffer(ct)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_dec(ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ct_buf, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Decapsulation failed")
-        return bytes(ss)
 
-class MLKEM1024:
+class MLKEM1024(_KEM):
+    PREFIX = "PQCLEAN_MLKEM1024_CLEAN"
     PUBLICKEY_BYTES = 1568
     SECRETKEY_BYTES = 3168
     CIPHERTEXT_BYTES = 1568
     SHAREDSECRET_BYTES = 32
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_enc.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_enc.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_dec.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_dec.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def encapsulate(self, pk):
-        ct = ctypes.create_string_buffer(self.CIPHERTEXT_BYTES)
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_enc(ctypes.cast(ct, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Encapsulation failed")
-        return bytes(ct), bytes(ss)
-    def decapsulate(self, ct, sk):
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        ct_buf = ctypes.create_string_buffer(ct)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_dec(ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ct_buf, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Decapsulation failed")
-        return bytes(ss)
 
-class MLDSA44:
+class MLDSA44(_Signature):
+    PREFIX = "PQCLEAN_MLDSA44_CLEAN"
     PUBLICKEY_BYTES = 1312
     SECRETKEY_BYTES = 2560
     SIGNATURE_BYTES = 2420
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_open.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_open.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def sign(self, message, sk):
-        sm = ctypes.create_string_buffer(len(message) + self.SIGNATURE_BYTES)
-        smlen = ctypes.c_ulonglong()
-        msg_buf = ctypes.create_string_buffer(message)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign(ctypes.cast(sm, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(smlen), ctypes.cast(msg_buf, ctypes.POINTER(ctypes.c_ubyte)), len(message), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Signing failed")
-        return bytes(sm[:smlen.value])
-    def verify(self, signed_message, pk):
-        m = ctypes.create_string_buffer(len(signed_message))
-        mlen = ctypes.c_ulonglong()
-        sm_buf = ctypes.create_string_buffer(signed_message)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_open(ctypes.cast(m, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(mlen), ctypes.cast(sm_buf, ctypes.POINTER(ctypes.c_ubyte)), len(signed_message), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Verification failed")
-        return bytes(m[:mlen.value])
 
-class MLDSA65:
+class MLDSA65(_Signature):
+    PREFIX = "PQCLEAN_MLDSA65_CLEAN"
     PUBLICKEY_BYTES = 1952
     SECRETKEY_BYTES = 4032
     SIGNATURE_BYTES = 3309
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_open.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_open.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def sign(self, message, sk):
-        sm = ctypes.create_string_buffer(len(message) + self.SIGNATURE_BYTES)
-        smlen = ctypes.c_ulonglong()
-        msg_buf = ctypes.create_string_buffer(message)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign(ctypes.cast(sm, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(smlen), ctypes.cast(msg_buf, ctypes.POINTER(ctypes.c_ubyte)), len(message), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Signing failed")
-        return bytes(sm[:smlen.value])
-    def verify(self, signed_message, pk):
-        m = ctypes.create_string_buffer(len(signed_message))
-        mlen = ctypes.c_ulonglong()
-        sm_buf = ctypes.create_string_buffer(signed_message)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_open(ctypes.cast(m, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(mlen), ctypes.cast(sm_buf, ctypes.POINTER(ctypes.c_ubyte)), len(signed_message), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Verification failed")
-        return bytes(m[:mlen.value])
 
-class MLDSA87:
+class MLDSA87(_Signature):
+    PREFIX = "PQCLEAN_MLDSA87_CLEAN"
     PUBLICKEY_BYTES = 2592
     SECRETKEY_BYTES = 4896
     SIGNATURE_BYTES = 4627
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_open.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_open.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def sign(self, message, sk):
-        sm = ctypes.create_string_buffer(len(message) + self.SIGNATURE_BYTES)
-        smlen = ctypes.c_ulonglong()
-        msg_buf = ctypes.create_string_buffer(message)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign(ctypes.cast(sm, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(smlen), ctypes.cast(msg_buf, ctypes.POINTER(ctypes.c_ubyte)), len(message), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Signing failed")
-        return bytes(sm[:smlen.value])
-    def verify(self, signed_message, pk):
-        m = ctypes.create_string_buffer(len(signed_message))
-        mlen = ctypes.c_ulonglong()
-        sm_buf = ctypes.create_string_buffer(signed_message)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_open(ctypes.cast(m, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(mlen), ctypes.cast(sm_buf, ctypes.POINTER(ctypes.c_ubyte)), len(signed_message), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Verification failed")
-        return bytes(m[:mlen.value])
 
-class Falcon512:
+class Falcon512(_Signature):
+    PREFIX = "PQCLEAN_FALCON512_CLEAN"
     PUBLICKEY_BYTES = 897
     SECRETKEY_BYTES = 1281
     SIGNATURE_BYTES = 752
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign.restype = ctypes.c_int
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_open.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_open.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def sign(self, message, sk):
-        sm = ctypes.create_string_buffer(len(message) + self.SIGNATURE_BYTES)
-        smlen = ctypes.c_ulonglong()
-        msg_buf = ctypes.create_string_buffer(message)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign(ctypes.cast(sm, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(smlen), ctypes.cast(msg_buf, ctypes.POINTER(ctypes.c_ubyte)), len(message), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Signing failed")
-        return bytes(sm[:smlen.value])
-    def verify(self, signed_message, pk):
-        m = ctypes.create_string_buffer(len(signed_message))
-        mlen = ctypes.c_ulonglong()
-        sm_buf = ctypes.create_string_buffer(signed_message)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_open(ctypes.cast(m, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(mlen), ctypes.cast(sm_buf, ctypes.POINTER(ctypes.c_ubyte)), len(signed_message), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Verification failed")
-        return bytes(m[:mlen.value])
 
-class Falcon1024:
+class Falcon1024(_Signature):
+    PREFIX = "PQCLEAN_FALCON1024_CLEAN"
     PUBLICKEY_BYTES = 1793
     SECRETKEY_BYTES = 2305
     SIGNATURE_BYTES = 1462
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign.restype = ctypes.c_int
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_open.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_open.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def sign(self, message, sk):
-        sm = ctypes.create_string_buffer(len(message) + self.SIGNATURE_BYTES)
-        smlen = ctypes.c_ulonglong()
-        msg_buf = ctypes.create_string_buffer(message)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign(ctypes.cast(sm, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(smlen), ctypes.cast(msg_buf, ctypes.POINTER(ctypes.c_ubyte)), len(message), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Signing failed")
-        return bytes(sm[:smlen.value])
-    def verify(self, signed_message, pk):
-        m = ctypes.create_string_buffer(len(signed_message))
-        mlen = ctypes.c_ulonglong()
-        sm_buf = ctypes.create_string_buffer(signed_message)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_open(ctypes.cast(m, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(mlen), ctypes.cast(sm_buf, ctypes.POINTER(ctypes.c_ubyte)), len(signed_message), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Verification failed")
-        return bytes(m[:mlen.value])
 
 ## ---------------------------------------------------------------------------------------------------------------------------------------------------------
 ##                           MAIN TESTING LOGIC
 ## ---------------------------------------------------------------------------------------------------------------------------------------------------------
 
-print(colored("="*60, "cyan"))
-print(colored(f"PQC Algorithm Binary path is {CACHE_DIR}", "cyan"))
-print(colored("="*60, "cyan"))
+if "NO_COLOR" in os.environ:
+    C = dict.fromkeys(C, "")
+    R = ""
 
-def write_file(name, contentType, content):
-    exp_path = EXP_DIR / name
-    exp_bin_path = EXP_DIR / name / 'bin'
-    exp_path.mkdir(parents=True, exist_ok=True)
-    exp_bin_path.mkdir(parents=True, exist_ok=True)
-    
+@functools.lru_cache(maxsize=None)
+def get_backend(algo_class):
+    # One instance per algorithm class, so repeated tests reuse the loaded library
+    return algo_class(METADATA_URL, CACHE_DIR)
+
+def _prefetch():
+    try:
+        get_binary_path(METADATA_URL, CACHE_DIR)
+    except Exception:
+        pass  # reported by each test when its backend fails to load
+
+def _write(path, data):
+    # Every artifact is written in a single call, so skip the BufferedWriter copy
+    with open(path, "wb", buffering=0) as f:
+        f.write(data)
+
+def write_file(exp_dir, exp_bin_dir, contentType, content, text=False):
+    # Output directories already exist, see the __main__ block. Paths are plain strings
+    # computed once per algorithm, so no Path objects are built per artifact
+    # Save bytes that already hold UTF-8 text as-is, without a decode/encode round trip
+    if text:
+        _write(f"{exp_dir}{os.sep}{contentType}.txt", content)
     # Save binary version if content is bytes
-    if isinstance(content, bytes):
-        bin_file = exp_bin_path / f"{contentType}.bin"
-        with open(bin_file, "wb") as f:
-            f.write(content)
+    elif isinstance(content, bytes):
+        _write(f"{exp_bin_dir}{os.sep}{contentType}.bin", content)
         # Save hex version in text file
-        txt_file = exp_path / f"{contentType}.txt"
-        hex_content = content.hex()
-        with open(txt_file, "w", encoding="utf-8") as f:
-            f.write(hex_content)
+        if WRITE_HEX:
+            _write(f"{exp_dir}{os.sep}{contentType}.txt", binascii.hexlify(content))
     # Save only text version if content is string
     elif isinstance(content, str):
-        txt_file = exp_path / f"{contentType}.txt"
-        with open(txt_file, "w", encoding="utf-8") as f:
-            f.write(content)
+        _write(f"{exp_dir}{os.sep}{contentType}.txt", content.encode("utf-8"))
+
+def _skipped(name, lines, error):
+    # The library couldn't be loaded, so the algorithm is skipped before any artifact is written
+    lines.append(f"{C['red']}Skipped: failed to load {name} - {error}{R}")
+    lines.append(f"{C['white']}Test of {name} algorithm ended\n{R}")
+    return "\n".join(lines) + "\n"
 
 def test_kem(name, kem_class, secret_message):
+    # output directories are created up front by the main process
+    exp_dir = os.path.join(EXP_DIR, name)
+    exp_bin_dir = os.path.join(exp_dir, 'bin')
     msg_file       = "message"
     pk_file        = "public_key"
     sk_file        = "secret_key"
@@ -385,66 +547,135 @@ def test_kem(name, kem_class, secret_message):
     encrypted_file = "encrypted_message"
     decrypted_file = "decrypted_message"
     
-    write_file(name, "message", secret_message.decode())
-    print(colored(f"Starting test of {name} algorithm, creating pk,sk", "blue"))
-    kem = kem_class(METADATA_URL, CACHE_DIR)
+    lines = [f"{C['blue']}Starting test of {name} algorithm, creating pk,sk{R}"]
+    try:
+        kem = get_backend(kem_class)
+    except Exception as e:
+        return _skipped(name, lines, e)
+    write_file(exp_dir, exp_bin_dir, "message", secret_message, text=True)
     pk, sk = kem.keypair()
-    write_file(name, "public_key", pk)
-    write_file(name, "secret_key", sk)
+    write_file(exp_dir, exp_bin_dir, "public_key", pk)
+    write_file(exp_dir, exp_bin_dir, "secret_key", sk)
     ct, ss1 = kem.encapsulate(pk)
-    write_file(name, "ciphertext", ct)
-    write_file(name, "shared_secret_1", ss1)
-    print(colored(f"pk length: {len(pk)}, sk length: {len(sk)}, encrypted msg length: {len(ct)}", "yellow"))
+    write_file(exp_dir, exp_bin_dir, "ciphertext", ct)
+    write_file(exp_dir, exp_bin_dir, "shared_secret_1", ss1)
+    lpk, lsk, lct = len(pk), len(sk), len(ct)
+    lines.append(f"{C['yellow']}pk length: {lpk}, sk length: {lsk}, encrypted msg length: {lct}{R}")
     ss2 = kem.decapsulate(ct, sk)
-    write_file(name, "shared_secret_2", ss2)
-    result = "SUCCESS" if ss1 == ss2 else "FAILED"
-    print(colored(f"Decryption result: {result} (shared secret matched: {ss1 == ss2})", "green"))
-    print(colored(f"Test of {name} algorithm ended\n", "white"))
+    write_file(exp_dir, exp_bin_dir, "shared_secret_2", ss2)
+    matched = compare_digest(ss1, ss2)
+    result = "SUCCESS" if matched else "FAILED"
+    lines.append(f"{C['green']}Decryption result: {result} (shared secret matched: {matched}){R}")
+    lines.append(f"{C['white']}Test of {name} algorithm ended\n{R}")
+    return "\n".join(lines) + "\n"
 
 def test_signature(name, sig_class, secret_message):
-    # create output directory for this algorithm
-    exp_path = EXP_DIR / name
-    exp_path.mkdir(parents=True, exist_ok=True)
+    # output directories are created up front by the main process
+    exp_dir = os.path.join(EXP_DIR, name)
+    exp_bin_dir = os.path.join(exp_dir, 'bin')
     msg_file       = "message"
     pk_file        = "public_key"
     sk_file        = "secret_key"
     encrypted_file = "encrypted_message"
     decrypted_file = "decrypted_message"
     
-    write_file(name, "message", secret_message.decode())
+    lines = [f"{C['blue']}Starting test of {name} algorithm, creating pk,sk{R}"]
+    try:
+        sig = get_backend(sig_class)
+    except Exception as e:
+        return _skipped(name, lines, e)
+    write_file(exp_dir, exp_bin_dir, "message", secret_message, text=True)
     
     try:
-        print(colored(f"Starting test of {name} algorithm, creating pk,sk", "blue"))
-        sig = sig_class(METADATA_URL, CACHE_DIR)
         pk, sk = sig.keypair()
-        write_file(name, "public_key", pk)
-        write_file(name, "secret_key", sk)
+        write_file(exp_dir, exp_bin_dir, "public_key", pk)
+        write_file(exp_dir, exp_bin_dir, "secret_key", sk)
         signed = sig.sign(secret_message, sk)
-        write_file(name, "encrypted_message", signed)
-        print(colored(f"pk length: {len(pk)}, sk length: {len(sk)}, signed msg length: {len(signed)}", "yellow"))
+        write_file(exp_dir, exp_bin_dir, "encrypted_message", signed)
+        lpk, lsk, lsigned = len(pk), len(sk), len(signed)
+        lines.append(f"{C['yellow']}pk length: {lpk}, sk length: {lsk}, signed msg length: {lsigned}{R}")
         verified = sig.verify(signed, pk)
-        write_file(name, "decrypted_message", verified)
-        result = "SUCCESS" if verified == secret_message else "FAILED"
-        print(colored(f"Verification result: {result} (message matched: {verified == secret_message})", "green"))
-        print(colored(f"Test of {name} algorithm ended\n", "white"))
+        write_file(exp_dir, exp_bin_dir, "decrypted_message", verified)
+        matched = compare_digest(verified, secret_message)
+        result = "SUCCESS" if matched else "FAILED"
+        lines.append(f"{C['green']}Verification result: {result} (message matched: {matched}){R}")
+        lines.append(f"{C['white']}Test of {name} algorithm ended\n{R}")
     except Exception as e:
-        print(colored(f"pk length: N/A, sk length: N/A, signed msg length: N/A", "yellow"))
-        print(colored(f"Verification result: FAILED - {str(e)}", "red"))
-        print(colored(f"Test of {name} algorithm ended\n", "white"))
-
-secret_message = b"This is a secret message for PQC testing!"
-print(colored(f"Secret message: {secret_message.decode()}", "red"))
-print()
-
-test_kem("ML-KEM-512",          MLKEM512, secret_message)
-test_kem("ML-KEM-768",          MLKEM768, secret_message)
-test_kem("ML-KEM-1024",        MLKEM1024, secret_message)
-test_signature("ML-DSA-44",      MLDSA44, secret_message)
-test_signature("ML-DSA-65",      MLDSA65, secret_message)
-test_signature("ML-DSA-87",      MLDSA87, secret_message)
-test_signature("Falcon-512",   Falcon512, secret_message)
-test_signature("Falcon-1024", Falcon1024, secret_message)
-
-print(colored("\n" + "="*60, "cyan"))
-print(colored("All 8 PQC algorithms tested!", "green"))
-print(colored("="*60, "cyan"))
\ No newline at end of file
+        lines.append(f"{C['yellow']}pk length: N/A, sk length: N/A, signed msg length: N/A{R}")
+        lines.append(f"{C['red']}Verification result: FAILED - {str(e)}{R}")
+        lines.append(f"{C['white']}Test of {name} algorithm ended\n{R}")
+    return "\n".join(lines) + "\n"
+
+TESTS = {"kem": test_kem, "sig": test_signature}
+SUITE = [
+    ("kem", "ML-KEM-512",   MLKEM512),
+    ("kem", "ML-KEM-768",   MLKEM768),
+    ("kem", "ML-KEM-1024", MLKEM1024),
+    ("sig", "ML-DSA-44",     MLDSA44),
+    ("sig", "ML-DSA-65",     MLDSA65),
+    ("sig", "ML-DSA-87",     MLDSA87),
+    ("sig", "Falcon-512",  Falcon512),
+    ("sig", "Falcon-1024", Falcon1024),
+]
+
+# Rough relative runtime of each test (Falcon key generation dominates), used to start the
+# slowest jobs first so a short job never ends up last on the critical path
+COST = {
+    "Falcon-1024": 8, "Falcon-512": 7,
+    "ML-DSA-87": 6, "ML-DSA-65": 5, "ML-DSA-44": 4,
+    "ML-KEM-1024": 3, "ML-KEM-768": 2, "ML-KEM-512": 1,
+}
+
+def _run(job):
+    # Runs one algorithm test in a worker process; each test returns its whole log block
+    # as one string so the output of parallel jobs doesn't interleave on stdout
+    kind, name, algo_class, secret_message = job
+    return TESTS[kind](name, algo_class, secret_message)
+
+if __name__ == "__main__":
+    # Resolve (and on a cold cache download) the shared library in the background, so the
+    # network round trips overlap argument parsing and output directory setup
+    prefetch = threading.Thread(target=_prefetch, daemon=True)
+    prefetch.start()
+    parser = argparse.ArgumentParser(description="Test the PQC algorithm binaries")
+    parser.add_argument("algorithms", nargs="*", metavar="PREFIX",
+                        help="only test algorithms whose name starts with one of these prefixes (e.g. ML-KEM Falcon-512)")
+    args = parser.parse_args()
+    suite = [entry for entry in SUITE if not args.algorithms or entry[1].startswith(tuple(args.algorithms))]
+    if not suite:
+        parser.error(f"no algorithm matches {', '.join(args.algorithms)}")
+
+    rule = f"{C['cyan']}{'='*60}{R}"
+    secret_message = b"This is a secret message for PQC testing!"
+    sys.stdout.write(f"{rule}\n{C['cyan']}PQC Algorithm Binary path is {CACHE_DIR}{R}\n{rule}\n"
+                     f"{C['red']}Secret message: {secret_message.decode()}{R}\n\n")
+
+    jobs = [(kind, name, algo_class, secret_message) for kind, name, algo_class in suite]
+    for _, name, _ in suite:
+        (EXP_DIR / name / 'bin').mkdir(parents=True, exist_ok=True)
+    prefetch.join()
+    # Load every library here once, before any worker starts. Forked workers inherit the
+    # backends copy-on-write and threads share them directly
+    for _, _, algo_class in suite:
+        try:
+            get_backend(algo_class)
+        except Exception:
+            pass  # reported by the test itself
+    # Each algorithm is independent and CPU-bound in native code, so run them side by side.
+    # Fork on Linux so workers start from this already-initialised process. macOS offers fork
+    # but it is unsafe once system frameworks are in use (urllib's proxy lookup has just run),
+    # and Windows has none; spawned workers would re-import the script and reload every
+    # library, so use threads there instead; ctypes releases the GIL for each native call
+    workers = min(len(jobs), os.cpu_count() or 1)
+    if sys.platform.startswith("linux"):
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+    with pool as executor:
+        futures = {job[1]: executor.submit(_run, job)
+                   for job in sorted(jobs, key=lambda job: COST.get(job[1], 0), reverse=True)}
+        # Results are still reported in suite order
+        for job in jobs:
+            sys.stdout.write(futures[job[1]].result())
+
+    sys.stdout.write(f"{C['cyan']}\n{'='*60}{R}\n{C['green']}All {len(jobs)} PQC algorithms tested!{R}\n{rule}\n")
\ No newline at end of file
@@ -1,4 +1,4 @@
 ﻿"""PQC Utils Package"""
-from .bin import detect_platform, download_file, get_binary_path
+from .bin import detect_platform, download_file, fetch_metadata, get_binary_path
 from .classes import MLKEM512, MLKEM768, MLKEM1024, MLDSA44, MLDSA65, MLDSA87, Falcon512, Falcon1024
 __all__ = ["MLKEM512", "MLKEM768", "MLKEM1024", "MLDSA44", "MLDSA65", "MLDSA87", "Falcon512", "Falcon1024"]
@@ -1,55 +1,127 @@
+import os
 import json
+import shutil
+import hashlib
 import platform
-import urllib.request
+import functools
 from pathlib import Path
 
 METADATA_URL = "https://github.com/QudsLab/PQChub/raw/refs/heads/main/bins/binaries.json"
 CACHE_DIR = Path("download_cache")
+LIBRARY_SUFFIXES = (".so", ".dll", ".dylib")
 
-def detect_platform() -> (bool, str):
-    system = platform.system().lower()
-    machine = platform.machine().lower()
-    
-    if system == "windows":
-        if "64" in machine or "amd64" in machine:
-            return (True, "windows-x64")
-        else:
-            return (True, "windows-x86")
-    elif system == "darwin":
-        if "arm" in machine or "aarch64" in machine:
-            return (True, "macos-arm64")
-        else:
-            return (True, "macos-x86_64")
-    elif system == "linux":
-        if "aarch64" in machine or "arm64" in machine:
-            return (True, "linux-aarch64")
-        else:
-            return (True, "linux-x86_64")
-    else:
-        raise (False, f"Unsupported platform: {system} {machine}")
-def download_file(url, dest_path) -> (bool, str):
+# system -> (machine substrings of the first variant, first variant, fallback variant)
+_PLATFORMS = {
+    "windows": (("64",), "windows-x64", "windows-x86"),
+    "darwin": (("arm", "aarch64"), "macos-arm64", "macos-x86_64"),
+    "linux": (("aarch64", "arm64"), "linux-aarch64", "linux-x86_64"),
+}
+
+@functools.lru_cache(maxsize=1)
+def detect_platform() -> str:
+    uname = platform.uname()
+    system = uname.system.lower()
+    machine = uname.machine.lower()
+    if system not in _PLATFORMS:
+        raise Exception(f"Unsupported platform: {system} {machine}")
+    markers, matched, fallback = _PLATFORMS[system]
+    return matched if any(m in machine for m in markers) else fallback
+
+# macOS sysctls for the CPU features the AVX2 builds rely on; every SSE4.2 CPU has POPCNT
+_MACOS_SYSCTLS = {"avx2": b"hw.optional.avx2_0", "bmi2": b"hw.optional.bmi2",
+                  "fma": b"hw.optional.fma", "popcnt": b"hw.optional.sse4_2"}
+
+def _windows_cpu_flags() -> frozenset:
+    import ctypes
+    # Assumes BMI2, POPCNT and FMA whenever AVX2 is present: Windows has no feature to query for
+    # them, and every AVX2 CPU (Intel Haswell, AMD Excavator and later) has all three.
+    # 40 is PF_AVX2_INSTRUCTIONS_AVAILABLE
+    if ctypes.windll.kernel32.IsProcessorFeaturePresent(40):
+        return frozenset(("avx2", "bmi2", "popcnt", "fma"))
+    return frozenset()
+def _macos_cpu_flags() -> frozenset:
+    import ctypes
+    libc = ctypes.CDLL(None)
+    flags = set()
+    for flag, name in _MACOS_SYSCTLS.items():
+        # Unknown names (e.g. on Apple silicon) fail, which leaves the flag out
+        value, size = ctypes.c_int(0), ctypes.c_size_t(ctypes.sizeof(ctypes.c_int))
+        if libc.sysctlbyname(name, ctypes.byref(value), ctypes.byref(size), None, 0) == 0 and value.value:
+            flags.add(flag)
+    return frozenset(flags)
+@functools.lru_cache(maxsize=1)
+def detect_cpu_flags() -> frozenset:
+    # Windows and macOS are asked through their system APIs; Linux lists the flags in /proc/cpuinfo
+    system = platform.system()
+    if system == "Windows":
+        return _windows_cpu_flags()
+    if system == "Darwin":
+        return _macos_cpu_flags()
     try:
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-        urllib.request.urlretrieve(url, dest_path)
-        return (True, "Download successful")
-    except Exception as e:
-        return (False, str(e))
-def get_binary_path(metadata_url, cache_dir) -> (bool, bool, str):
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return frozenset(line.partition(":")[2].split())
+    except OSError:
+        pass
+    return frozenset()
+def download_file(url, dest_path, sha256=None) -> None:
+    # The HTTP stack is imported on first use; a run with a warm cache never needs it
+    import urllib.error
+    import urllib.request
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    # Stream in large chunks into a temporary file and move it into place once complete,
+    # so an interrupted download never leaves a truncated library in the cache
+    tmp_path = f"{dest_path}.part"
+    # A .part file left by an interrupted run is resumed with a Range request
+    offset = os.path.getsize(tmp_path) if os.path.isfile(tmp_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
     try:
-        platform_status, platform_id = detect_platform()
-        if platform_status:
-            with urllib.request.urlopen(metadata_url) as response:
-                metadata = json.loads(response.read().decode('utf-8'))
-            if platform_id in metadata['binaries']:
-                binary_info = metadata['binaries'][platform_id]
-                binary_url = binary_info['url']
-                binary_filename = binary_info['filename']
-                cached_path = cache_dir / platform_id / binary_filename
-                if cached_path.exists():
-                    return (True, False, str(cached_path))
-                else:
-                    download_file(binary_url, cached_path)
-                    return (True, True, str(cached_path))
-    except Exception as e:
-        return (False, False, str(e))
-    return (False, False, "Unsupported platform")
\ No newline at end of file
+        response = urllib.request.urlopen(urllib.request.Request(url, headers=headers))
+    except urllib.error.HTTPError as e:
+        if e.code != 416:
+            raise
+        # The range lies beyond the file, so the .part file can't be trusted; start over
+        e.close()
+        offset = 0
+        response = urllib.request.urlopen(url)
+    with response, open(tmp_path, 'ab' if offset and response.status == 206 else 'wb') as f:
+        shutil.copyfileobj(response, f, length=1 << 18)
+    # Only a download matching the published checksum is moved into the cache
+    if sha256 is not None:
+        with open(tmp_path, 'rb') as f:
+            if hasattr(hashlib, "file_digest"):
+                # Python 3.11+: hashed straight from the file in C, no Python-level read loop
+                digest = hashlib.file_digest(f, "sha256")
+            else:
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        if digest.hexdigest() != sha256.lower():
+            os.remove(tmp_path)
+            raise Exception(f"Checksum mismatch for {url}")
+    os.replace(tmp_path, dest_path)
+@functools.lru_cache(maxsize=None)
+def fetch_metadata(metadata_url) -> dict:
+    import urllib.request
+    # Parsed once per process; every algorithm class resolves its binary from the same metadata
+    with urllib.request.urlopen(metadata_url) as response:
+        return json.loads(response.read().decode('utf-8'))
+@functools.lru_cache(maxsize=None)
+def get_binary_path(metadata_url, cache_dir) -> str:
+    platform_id = detect_platform()
+    # A library already in the platform cache is used as-is, without fetching binaries.json
+    platform_dir = os.path.join(cache_dir, platform_id)
+    if os.path.isdir(platform_dir):
+        with os.scandir(platform_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(LIBRARY_SUFFIXES) and entry.is_file():
+                    return entry.path
+    metadata = fetch_metadata(metadata_url)
+    if platform_id not in metadata['binaries']:
+        raise Exception(f"No binary published for {platform_id}")
+    binary_info = metadata['binaries'][platform_id]
+    cached_path = os.path.join(platform_dir, binary_info['filename'])
+    if not os.path.isfile(cached_path):
+        download_file(binary_info['url'], cached_path, binary_info.get('checksums', {}).get('sha256'))
+    return cached_path
\ No newline at end of file
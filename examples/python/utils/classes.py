@@ -1,285 +1,352 @@
+import os
 import ctypes
-from .bin import get_binary_path
+import functools
+import threading
+from .bin import detect_cpu_flags, get_binary_path
 
+_UBP = ctypes.POINTER(ctypes.c_ubyte)
+# PQClean takes message and signature lengths as size_t (4 bytes on 32-bit platforms)
+_SZ = ctypes.c_size_t
+_SZP = ctypes.POINTER(ctypes.c_size_t)
+_byref = ctypes.byref
+_string_at = ctypes.string_at
+_memset = ctypes.memset
+_setup_lock = threading.Lock()
+# Optimised PQClean implementations, fastest first, with the CPU flags each one needs.
+# A class uses the first one its library exports and the CPU supports, else CLEAN
+_IMPLEMENTATIONS = (
+    # The AVX2 objects are also compiled with -mbmi2 -mpopcnt -mfma
+    ("AVX2", ("avx2", "bmi2", "popcnt", "fma")),
+)
+
+def _readonly(data, zerocopy=False):
+    # PQClean only reads its input buffers, so bytes are passed as c_char_p and ctypes hands C
+    # a pointer to their contents without copying; other buffer types are converted once
+    if type(data) is bytes:
+        return data
+    if zerocopy and isinstance(data, (bytearray, memoryview)):
+        view = memoryview(data)
+        if not view.readonly and view.c_contiguous:
+            # Aliases the caller's writable buffer, which must not change during the call. The
+            # byte view makes the length count bytes rather than items (e.g. array('I') views)
+            view = view.cast("B")
+            return (ctypes.c_char * view.nbytes).from_buffer(view)
+    return bytes(data)
+
+def _secret_key(sk):
+    # A secret key in a writable buffer (e.g. a bytearray the caller wipes later) is always
+    # passed in place, so no unwiped copy of it is left behind for the garbage collector
+    return _readonly(sk, zerocopy=True)
+
+def _take_secret(buf):
+    # Copies a secret key or shared secret out of a reused buffer and clears the buffer with one
+    # C memset, so the secret doesn't linger in it until the next call overwrites it
+    secret = bytes(buf)
+    _memset(buf, 0, len(buf))
+    return secret
+
+def _wipe(data):
+    # Clears a bytearray of secrets in place, also with one C memset
+    _memset((ctypes.c_char * len(data)).from_buffer(data), 0, len(data))
+
+@functools.lru_cache(maxsize=1)
+def _executor():
+    # Shared by every *_async method and created on first use. Native calls run without the
+    # GIL and output buffers are per thread, so the workers sign and verify in parallel
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+@functools.lru_cache(maxsize=None)
 def load_library(metadata_url, cache_dir):
-    success, is_new, binary_path = get_binary_path(metadata_url, cache_dir)
-    if success and binary_path:
-        return ctypes.CDLL(str(binary_path))
-    raise Exception(f"Failed to load library: {binary_path}")
+    try:
+        binary_path = get_binary_path(metadata_url, cache_dir)
+    except Exception as e:
+        raise Exception(f"Failed to load library: {e}") from e
+    return ctypes.CDLL(binary_path)
 
-class MLKEM512:
-    PUBLICKEY_BYTES = 800
-    SECRETKEY_BYTES = 1632
-    CIPHERTEXT_BYTES = 768
-    SHAREDSECRET_BYTES = 32
+# Output buffers are allocated once per instance and thread and reused by every call;
+# results are copied out as bytes, so the buffers never escape
+class _Buffers(threading.local):
+    def __init__(self):
+        # Length out-parameter of crypto_sign/crypto_sign_open, reused like the buffers
+        self.length = _SZ()
+    def get(self, name, size):
+        buf = self.__dict__.get(name)
+        if buf is None:
+            buf = self.__dict__[name] = (ctypes.c_ubyte * size)()
+        elif len(buf) < size:
+            # Grow geometrically so a run of ever longer messages reallocates only O(log n) times
+            buf = self.__dict__[name] = (ctypes.c_ubyte * max(size, 2 * len(buf)))()
+        return buf
+
+# Every algorithm of a kind exposes the same PQClean API under its own symbol prefix, so the
+# wrappers only differ in PREFIX and the byte sizes
+class _PQCBase:
+    PREFIX = None
+    # (attribute, PQClean function name, argtypes) for every function the wrapper calls
+    _PROTOS = ()
     def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_enc.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_enc.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_dec.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_dec.restype = ctypes.c_int
+        binding = type(self).__dict__.get("_bindings", {}).get((metadata_url, cache_dir))
+        if binding is None:
+            binding = self._bind(metadata_url, cache_dir)
+        self.lib, functions = binding
+        self.__dict__.update(functions)
+        self._buffers = _Buffers()
+    @classmethod
+    def _bind(cls, metadata_url, cache_dir):
+        # Library and prototypes are set up once per class and (metadata_url, cache_dir); later
+        # instances with the same arguments share them, so a different cache_dir gets its own
+        # library. The lock keeps threads constructing the same class from configuring it twice
+        key = (metadata_url, cache_dir)
+        with _setup_lock:
+            bindings = cls.__dict__.get("_bindings")
+            if bindings is None:
+                bindings = {}
+                cls._bindings = bindings
+            if key in bindings:
+                return bindings[key]
+            lib = load_library(metadata_url, cache_dir)
+            prefix = cls.PREFIX
+            flags = detect_cpu_flags()
+            for impl, required in _IMPLEMENTATIONS:
+                candidate = cls.PREFIX.replace("_CLEAN", f"_{impl}")
+                if flags.issuperset(required) and hasattr(lib, f"{candidate}_{cls._PROTOS[0][1]}"):
+                    prefix = candidate
+                    break
+            functions = {}
+            for attr, name, argtypes in cls._PROTOS:
+                fn = getattr(lib, f"{prefix}_{name}")
+                fn.argtypes = argtypes
+                fn.restype = ctypes.c_int
+                functions[attr] = fn
+            bindings[key] = (lib, functions)
+            return bindings[key]
+    def _keypair_batch(self, keypair, n):
+        # n key pairs written into two contiguous bytearrays and split afterwards, the same way
+        # as _KEM.encapsulate_batch; returns (list of public keys, list of secret keys)
+        pk_size, sk_size = self.PUBLICKEY_BYTES, self.SECRETKEY_BYTES
+        pk_type, sk_type = ctypes.c_ubyte * pk_size, ctypes.c_ubyte * sk_size
+        pks, sks = bytearray(n * pk_size), bytearray(n * sk_size)
+        try:
+            for i in range(n):
+                if keypair(pk_type.from_buffer(pks, i * pk_size), sk_type.from_buffer(sks, i * sk_size)) != 0:
+                    raise Exception("Keypair failed")
+            pk_view, sk_view = memoryview(pks), memoryview(sks)
+            return ([pk_view[i:i + pk_size].tobytes() for i in range(0, n * pk_size, pk_size)],
+                    [sk_view[i:i + sk_size].tobytes() for i in range(0, n * sk_size, sk_size)])
+        finally:
+            # The secret keys have been copied out (or the batch failed); don't leave them behind
+            _wipe(sks)
+
+class _KEM(_PQCBase):
+    _PROTOS = (
+        ("_kem_keypair", "crypto_kem_keypair", [_UBP, _UBP]),
+        ("_kem_enc", "crypto_kem_enc", [_UBP, _UBP, ctypes.c_char_p]),
+        ("_kem_dec", "crypto_kem_dec", [_UBP, ctypes.c_char_p, ctypes.c_char_p]),
+    )
     def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
+        pk = self._buffers.get("pk", self.PUBLICKEY_BYTES)
+        sk = self._buffers.get("sk", self.SECRETKEY_BYTES)
+        if self._kem_keypair(pk, sk) != 0:
             raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def encapsulate(self, pk):
-        ct = ctypes.create_string_buffer(self.CIPHERTEXT_BYTES)
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_enc(ctypes.cast(ct, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
+        return bytes(pk), _take_secret(sk)
+    def keypair_batch(self, n):
+        return self._keypair_batch(self._kem_keypair, n)
+    def encapsulate(self, pk, zerocopy=False):
+        ct = self._buffers.get("ct", self.CIPHERTEXT_BYTES)
+        ss = self._buffers.get("ss", self.SHAREDSECRET_BYTES)
+        pk_buf = _readonly(pk, zerocopy)
+        if self._kem_enc(ct, ss, pk_buf) != 0:
             raise Exception("Encapsulation failed")
-        return bytes(ct), bytes(ss)
-    def decapsulate(self, ct, sk):
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        ct_buf = ctypes.create_string_buffer(ct)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLKEM512_CLEAN_crypto_kem_dec(ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ct_buf, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
+        return bytes(ct), _take_secret(ss)
+    def encapsulate_batch(self, pk, n):
+        # n encapsulations against one public key, written into two contiguous bytearrays and
+        # split afterwards; returns (list of ciphertexts, list of shared secrets)
+        ct_size, ss_size = self.CIPHERTEXT_BYTES, self.SHAREDSECRET_BYTES
+        ct_type, ss_type = ctypes.c_ubyte * ct_size, ctypes.c_ubyte * ss_size
+        cts, sss = bytearray(n * ct_size), bytearray(n * ss_size)
+        pk_buf = _readonly(pk)
+        try:
+            for i in range(n):
+                if self._kem_enc(ct_type.from_buffer(cts, i * ct_size), ss_type.from_buffer(sss, i * ss_size), pk_buf) != 0:
+                    raise Exception("Encapsulation failed")
+            ct_view, ss_view = memoryview(cts), memoryview(sss)
+            return ([ct_view[i:i + ct_size].tobytes() for i in range(0, n * ct_size, ct_size)],
+                    [ss_view[i:i + ss_size].tobytes() for i in range(0, n * ss_size, ss_size)])
+        finally:
+            _wipe(sss)
+    # The *_into variants write straight into caller-owned writable buffers (e.g. bytearray)
+    # of at least the output size, with no allocation or copy-out on the Python side
+    def keypair_into(self, pk_out, sk_out):
+        pk = (ctypes.c_ubyte * self.PUBLICKEY_BYTES).from_buffer(pk_out)
+        sk = (ctypes.c_ubyte * self.SECRETKEY_BYTES).from_buffer(sk_out)
+        if self._kem_keypair(pk, sk) != 0:
+            raise Exception("Keypair failed")
+    def encapsulate_into(self, pk, ct_out, ss_out):
+        ct = (ctypes.c_ubyte * self.CIPHERTEXT_BYTES).from_buffer(ct_out)
+        ss = (ctypes.c_ubyte * self.SHAREDSECRET_BYTES).from_buffer(ss_out)
+        pk_buf = _readonly(pk)
+        if self._kem_enc(ct, ss, pk_buf) != 0:
+            raise Exception("Encapsulation failed")
+    def decapsulate(self, ct, sk, zerocopy=False):
+        ss = self._buffers.get("ss", self.SHAREDSECRET_BYTES)
+        ct_buf = _readonly(ct, zerocopy)
+        sk_buf = _secret_key(sk)
+        if self._kem_dec(ss, ct_buf, sk_buf) != 0:
+            raise Exception("Decapsulation failed")
+        return _take_secret(ss)
+    def decapsulate_into(self, ct, sk, ss_out):
+        # Zero-copy variant, see keypair_into
+        ss = (ctypes.c_ubyte * self.SHAREDSECRET_BYTES).from_buffer(ss_out)
+        ct_buf = _readonly(ct)
+        sk_buf = _secret_key(sk)
+        if self._kem_dec(ss, ct_buf, sk_buf) != 0:
             raise Exception("Decapsulation failed")
-        return bytes(ss)
 
-class MLKEM768:
+class _Signature(_PQCBase):
+    _PROTOS = (
+        ("_sign_keypair", "crypto_sign_keypair", [_UBP, _UBP]),
+        ("_sign", "crypto_sign", [_UBP, _SZP, ctypes.c_char_p, _SZ, ctypes.c_char_p]),
+        ("_sign_open", "crypto_sign_open", [_UBP, _SZP, ctypes.c_char_p, _SZ, ctypes.c_char_p]),
+    )
+    def keypair(self):
+        pk = self._buffers.get("pk", self.PUBLICKEY_BYTES)
+        sk = self._buffers.get("sk", self.SECRETKEY_BYTES)
+        if self._sign_keypair(pk, sk) != 0:
+            raise Exception("Keypair failed")
+        return bytes(pk), _take_secret(sk)
+    def keypair_batch(self, n):
+        return self._keypair_batch(self._sign_keypair, n)
+    def sign(self, message, sk, zerocopy=False):
+        # The length is taken once, from the converted buffer, which counts bytes for any input
+        msg_buf = _readonly(message, zerocopy)
+        msg_len = len(msg_buf)
+        sk_buf = _secret_key(sk)
+        sm = self._buffers.get("sm", msg_len + self.SIGNATURE_BYTES)
+        smlen = self._buffers.length
+        if self._sign(sm, _byref(smlen), msg_buf, msg_len, sk_buf) != 0:
+            raise Exception("Signing failed")
+        # The reported length comes from the library; never read past the buffer it was given
+        if smlen.value > len(sm):
+            raise Exception("Signing failed: signature longer than SIGNATURE_BYTES")
+        return _string_at(sm, smlen.value)
+    def sign_many(self, messages, sk):
+        # Signs every message with one secret key: lookups are hoisted out of the loop and a
+        # single signed-message buffer, sized for the longest message, is reused throughout
+        messages = [_readonly(message) for message in messages]
+        if not messages:
+            return []
+        sk_buf = _secret_key(sk)
+        sm = self._buffers.get("sm", max(map(len, messages)) + self.SIGNATURE_BYTES)
+        smlen = self._buffers.length
+        smlen_ref = _byref(smlen)
+        sign = self._sign
+        signed = []
+        for message in messages:
+            if sign(sm, smlen_ref, message, len(message), sk_buf) != 0:
+                raise Exception("Signing failed")
+            if smlen.value > len(sm):
+                raise Exception("Signing failed: signature longer than SIGNATURE_BYTES")
+            signed.append(_string_at(sm, smlen.value))
+        return signed
+    # Zero-copy variants, see _KEM.keypair_into
+    def keypair_into(self, pk_out, sk_out):
+        pk = (ctypes.c_ubyte * self.PUBLICKEY_BYTES).from_buffer(pk_out)
+        sk = (ctypes.c_ubyte * self.SECRETKEY_BYTES).from_buffer(sk_out)
+        if self._sign_keypair(pk, sk) != 0:
+            raise Exception("Keypair failed")
+    def sign_into(self, message, sk, sm_out):
+        # sm_out needs room for len(message) + SIGNATURE_BYTES; returns the signed message length
+        msg_buf = _readonly(message)
+        msg_len = len(msg_buf)
+        sk_buf = _secret_key(sk)
+        sm = (ctypes.c_ubyte * (msg_len + self.SIGNATURE_BYTES)).from_buffer(sm_out)
+        smlen = self._buffers.length
+        if self._sign(sm, _byref(smlen), msg_buf, msg_len, sk_buf) != 0:
+            raise Exception("Signing failed")
+        return smlen.value
+    def verify(self, signed_message, pk, zerocopy=False):
+        sm_buf = _readonly(signed_message, zerocopy)
+        sm_len = len(sm_buf)
+        pk_buf = _readonly(pk, zerocopy)
+        m = self._buffers.get("m", sm_len)
+        mlen = self._buffers.length
+        if self._sign_open(m, _byref(mlen), sm_buf, sm_len, pk_buf) != 0:
+            raise Exception("Verification failed")
+        if mlen.value > sm_len:
+            raise Exception("Verification failed: message longer than the signed message")
+        return _string_at(m, mlen.value)
+    def verify_only(self, signed_message, pk):
+        # True/False instead of the recovered message: the message is opened into the reused
+        # per-thread buffer and never copied out
+        sm_buf = _readonly(signed_message)
+        sm_len = len(sm_buf)
+        m = self._buffers.get("m", sm_len)
+        return self._sign_open(m, _byref(self._buffers.length), sm_buf, sm_len, _readonly(pk)) == 0
+    def verify_many(self, signed_messages, pk):
+        # Batch counterpart of verify_only and mirror of sign_many: one public key, one reused
+        # buffer sized for the longest signed message; returns a list of True/False
+        signed_messages = [_readonly(sm) for sm in signed_messages]
+        if not signed_messages:
+            return []
+        pk_buf = _readonly(pk)
+        m = self._buffers.get("m", max(map(len, signed_messages)))
+        mlen_ref = _byref(self._buffers.length)
+        sign_open = self._sign_open
+        return [sign_open(m, mlen_ref, sm, len(sm), pk_buf) == 0 for sm in signed_messages]
+    # Futures-based variants, run on the shared worker pool
+    def sign_async(self, message, sk):
+        return _executor().submit(self.sign, message, sk)
+    def verify_async(self, signed_message, pk):
+        return _executor().submit(self.verify, signed_message, pk)
+
+class MLKEM512(_KEM):
+    PREFIX = "PQCLEAN_MLKEM512_CLEAN"
+    PUBLICKEY_BYTES = 800
+    SECRETKEY_BYTES = 1632
+    CIPHERTEXT_BYTES = 768
+    SHAREDSECRET_BYTES = 32
+
+class MLKEM768(_KEM):
+    PREFIX = "PQCLEAN_MLKEM768_CLEAN"
     PUBLICKEY_BYTES = 1184
     SECRETKEY_BYTES = 2400
     CIPHERTEXT_BYTES = 1088
     SHAREDSECRET_BYTES = 32
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_enc.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_enc.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_dec.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_dec.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def encapsulate(self, pk):
-        ct = ctypes.create_string_buffer(self.CIPHERTEXT_BYTES)
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_enc(ctypes.cast(ct, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Encapsulation failed")
-        return bytes(ct), bytes(ss)
-    def decapsulate(self, ct, sk):
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        ct_buf = ctypes.create_string_buffer(ct)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLKEM768_CLEAN_crypto_kem_dec(ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ct_buf, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Decapsulation failed")
-        return bytes(ss)
 
-class MLKEM1024:
+class MLKEM1024(_KEM):
+    PREFIX = "PQCLEAN_MLKEM1024_CLEAN"
     PUBLICKEY_BYTES = 1568
     SECRETKEY_BYTES = 3168
     CIPHERTEXT_BYTES = 1568
     SHAREDSECRET_BYTES = 32
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_enc.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_enc.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_dec.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_dec.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def encapsulate(self, pk):
-        ct = ctypes.create_string_buffer(self.CIPHERTEXT_BYTES)
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_enc(ctypes.cast(ct, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Encapsulation failed")
-        return bytes(ct), bytes(ss)
-    def decapsulate(self, ct, sk):
-        ss = ctypes.create_string_buffer(self.SHAREDSECRET_BYTES)
-        ct_buf = ctypes.create_string_buffer(ct)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLKEM1024_CLEAN_crypto_kem_dec(ctypes.cast(ss, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(ct_buf, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Decapsulation failed")
-        return bytes(ss)
 
-class MLDSA44:
+class MLDSA44(_Signature):
+    PREFIX = "PQCLEAN_MLDSA44_CLEAN"
     PUBLICKEY_BYTES = 1312
     SECRETKEY_BYTES = 2560
     SIGNATURE_BYTES = 2420
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_open.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_open.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def sign(self, message, sk):
-        sm = ctypes.create_string_buffer(len(message) + self.SIGNATURE_BYTES)
-        smlen = ctypes.c_ulonglong()
-        msg_buf = ctypes.create_string_buffer(message)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign(ctypes.cast(sm, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(smlen), ctypes.cast(msg_buf, ctypes.POINTER(ctypes.c_ubyte)), len(message), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Signing failed")
-        return bytes(sm[:smlen.value])
-    def verify(self, signed_message, pk):
-        m = ctypes.create_string_buffer(len(signed_message))
-        mlen = ctypes.c_ulonglong()
-        sm_buf = ctypes.create_string_buffer(signed_message)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLDSA44_CLEAN_crypto_sign_open(ctypes.cast(m, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(mlen), ctypes.cast(sm_buf, ctypes.POINTER(ctypes.c_ubyte)), len(signed_message), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Verification failed")
-        return bytes(m[:mlen.value])
 
-class MLDSA65:
+class MLDSA65(_Signature):
+    PREFIX = "PQCLEAN_MLDSA65_CLEAN"
     PUBLICKEY_BYTES = 1952
     SECRETKEY_BYTES = 4032
     SIGNATURE_BYTES = 3309
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_open.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_open.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def sign(self, message, sk):
-        sm = ctypes.create_string_buffer(len(message) + self.SIGNATURE_BYTES)
-        smlen = ctypes.c_ulonglong()
-        msg_buf = ctypes.create_string_buffer(message)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign(ctypes.cast(sm, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(smlen), ctypes.cast(msg_buf, ctypes.POINTER(ctypes.c_ubyte)), len(message), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Signing failed")
-        return bytes(sm[:smlen.value])
-    def verify(self, signed_message, pk):
-        m = ctypes.create_string_buffer(len(signed_message))
-        mlen = ctypes.c_ulonglong()
-        sm_buf = ctypes.create_string_buffer(signed_message)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLDSA65_CLEAN_crypto_sign_open(ctypes.cast(m, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(mlen), ctypes.cast(sm_buf, ctypes.POINTER(ctypes.c_ubyte)), len(signed_message), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Verification failed")
-        return bytes(m[:mlen.value])
 
-class MLDSA87:
+class MLDSA87(_Signature):
+    PREFIX = "PQCLEAN_MLDSA87_CLEAN"
     PUBLICKEY_BYTES = 2592
     SECRETKEY_BYTES = 4896
     SIGNATURE_BYTES = 4627
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign.restype = ctypes.c_int
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_open.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_open.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def sign(self, message, sk):
-        sm = ctypes.create_string_buffer(len(message) + self.SIGNATURE_BYTES)
-        smlen = ctypes.c_ulonglong()
-        msg_buf = ctypes.create_string_buffer(message)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign(ctypes.cast(sm, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(smlen), ctypes.cast(msg_buf, ctypes.POINTER(ctypes.c_ubyte)), len(message), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Signing failed")
-        return bytes(sm[:smlen.value])
-    def verify(self, signed_message, pk):
-        m = ctypes.create_string_buffer(len(signed_message))
-        mlen = ctypes.c_ulonglong()
-        sm_buf = ctypes.create_string_buffer(signed_message)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_MLDSA87_CLEAN_crypto_sign_open(ctypes.cast(m, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(mlen), ctypes.cast(sm_buf, ctypes.POINTER(ctypes.c_ubyte)), len(signed_message), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Verification failed")
-        return bytes(m[:mlen.value])
 
-class Falcon512:
+class Falcon512(_Signature):
+    PREFIX = "PQCLEAN_FALCON512_CLEAN"
     PUBLICKEY_BYTES = 897
     SECRETKEY_BYTES = 1281
     SIGNATURE_BYTES = 752
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign.restype = ctypes.c_int
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_open.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_open.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def sign(self, message, sk):
-        sm = ctypes.create_string_buffer(len(message) + self.SIGNATURE_BYTES)
-        smlen = ctypes.c_ulonglong()
-        msg_buf = ctypes.create_string_buffer(message)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign(ctypes.cast(sm, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(smlen), ctypes.cast(msg_buf, ctypes.POINTER(ctypes.c_ubyte)), len(message), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Signing failed")
-        return bytes(sm[:smlen.value])
-    def verify(self, signed_message, pk):
-        m = ctypes.create_string_buffer(len(signed_message))
-        mlen = ctypes.c_ulonglong()
-        sm_buf = ctypes.create_string_buffer(signed_message)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_FALCON512_CLEAN_crypto_sign_open(ctypes.cast(m, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(mlen), ctypes.cast(sm_buf, ctypes.POINTER(ctypes.c_ubyte)), len(signed_message), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Verification failed")
-        return bytes(m[:mlen.value])
 
-class Falcon1024:
+class Falcon1024(_Signature):
+    PREFIX = "PQCLEAN_FALCON1024_CLEAN"
     PUBLICKEY_BYTES = 1793
     SECRETKEY_BYTES = 2305
     SIGNATURE_BYTES = 1462
-    def __init__(self, metadata_url, cache_dir):
-        self.lib = load_library(metadata_url, cache_dir)
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_keypair.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_keypair.restype = ctypes.c_int
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign.restype = ctypes.c_int
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_open.argtypes = [ctypes.POINTER(ctypes.c_ubyte), ctypes.POINTER(ctypes.c_ulonglong), ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ulonglong, ctypes.POINTER(ctypes.c_ubyte)]
-        self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_open.restype = ctypes.c_int
-    def keypair(self):
-        pk = ctypes.create_string_buffer(self.PUBLICKEY_BYTES)
-        sk = ctypes.create_string_buffer(self.SECRETKEY_BYTES)
-        if self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_keypair(ctypes.cast(pk, ctypes.POINTER(ctypes.c_ubyte)), ctypes.cast(sk, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Keypair failed")
-        return bytes(pk), bytes(sk)
-    def sign(self, message, sk):
-        sm = ctypes.create_string_buffer(len(message) + self.SIGNATURE_BYTES)
-        smlen = ctypes.c_ulonglong()
-        msg_buf = ctypes.create_string_buffer(message)
-        sk_buf = ctypes.create_string_buffer(sk)
-        if self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign(ctypes.cast(sm, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(smlen), ctypes.cast(msg_buf, ctypes.POINTER(ctypes.c_ubyte)), len(message), ctypes.cast(sk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Signing failed")
-        return bytes(sm[:smlen.value])
-    def verify(self, signed_message, pk):
-        m = ctypes.create_string_buffer(len(signed_message))
-        mlen = ctypes.c_ulonglong()
-        sm_buf = ctypes.create_string_buffer(signed_message)
-        pk_buf = ctypes.create_string_buffer(pk)
-        if self.lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign_open(ctypes.cast(m, ctypes.POINTER(ctypes.c_ubyte)), ctypes.byref(mlen), ctypes.cast(sm_buf, ctypes.POINTER(ctypes.c_ubyte)), len(signed_message), ctypes.cast(pk_buf, ctypes.POINTER(ctypes.c_ubyte))) != 0:
-            raise Exception("Verification failed")
-        return bytes(m[:mlen.value])
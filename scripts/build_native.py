@@ -6,16 +6,21 @@ Builds a unified native library containing all supported PQC algorithms
 
 import os
 import sys
+import argparse
+import struct
+import hashlib
+import functools
 import subprocess
 import shutil
 from pathlib import Path
 import glob
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def run_command(cmd, cwd=None):
+def run_command(cmd, cwd=None, env=None):
     """Run a command and return success status"""
     try:
         print(f"Running: {' '.join(cmd)}")
-        result = subprocess.run(cmd, cwd=cwd, check=True, capture_output=True, text=True)
+        result = subprocess.run(cmd, cwd=cwd, env=env, check=True, capture_output=True, text=True)
         print(result.stdout)
         return True
     except subprocess.CalledProcessError as e:
@@ -24,7 +29,107 @@ def run_command(cmd, cwd=None):
         print(f"STDERR: {e.stderr}")
         return False
 
-def build_native_windows(target_platform, pqclean_source):
+# Functions exported for every KEM and signature implementation
+KEM_FUNCTIONS = ("crypto_kem_keypair", "crypto_kem_enc", "crypto_kem_dec")
+SIGN_FUNCTIONS = ("crypto_sign_keypair", "crypto_sign", "crypto_sign_open",
+                  "crypto_sign_signature", "crypto_sign_verify")
+
+def symbol_prefix(algo):
+    """PQClean namespace of an implementation directory, e.g.
+    crypto_kem/ml-kem-512/clean -> PQCLEAN_MLKEM512_CLEAN"""
+    _, name, impl = algo.split("/")
+    return f"PQCLEAN_{name.replace('-', '').upper()}_{impl.upper()}"
+
+# Training workload for --pgo: key generation, encapsulation/decapsulation and signing/verification
+# of every algorithm (and AVX2 variant) in the DLL, over a spread of message sizes. It runs as a
+# separate script so the DLL is unloaded, and its profile written, when it exits
+PGO_TRAINER = r'''
+import ctypes, sys
+lib = ctypes.CDLL(sys.argv[1])
+pk, sk, ct, ss = (ctypes.create_string_buffer(n) for n in (8192, 8192, 8192, 64))
+sm, out, length = ctypes.create_string_buffer(16384 + 8192), ctypes.create_string_buffer(16384 + 8192), ctypes.c_size_t()
+# 40 is PF_AVX2_INSTRUCTIONS_AVAILABLE; the AVX2 code would fault on a build host without it
+for impl in ("CLEAN", "AVX2") if ctypes.windll.kernel32.IsProcessorFeaturePresent(40) else ("CLEAN",):
+    for alg in ("MLKEM512", "MLKEM768", "MLKEM1024"):
+        prefix = f"PQCLEAN_{alg}_{impl}_crypto_kem_"
+        if not hasattr(lib, prefix + "keypair"):
+            continue
+        keypair, enc, dec = (getattr(lib, prefix + name) for name in ("keypair", "enc", "dec"))
+        for _ in range(200):
+            keypair(pk, sk); enc(ct, ss, pk); dec(ss, ct, sk)
+    for alg in ("MLDSA44", "MLDSA65", "MLDSA87", "FALCON512", "FALCON1024"):
+        prefix = f"PQCLEAN_{alg}_{impl}_crypto_sign"
+        if not hasattr(lib, prefix + "_keypair"):
+            continue
+        keypair, sign, sign_open = (getattr(lib, prefix + name) for name in ("_keypair", "", "_open"))
+        sign.argtypes = sign_open.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.c_size_t), ctypes.c_char_p, ctypes.c_size_t, ctypes.c_char_p]
+        for _ in range(20):
+            keypair(pk, sk)
+            for size in (32, 256, 1024, 16384):
+                sign(sm, ctypes.byref(length), b"\x5a" * size, size, sk)
+                sign_open(out, ctypes.byref(length), sm.raw, length.value, pk)
+'''
+
+@functools.lru_cache(maxsize=None)
+def headers_digest(directory):
+    """BLAKE2b digest of every header under directory"""
+    digest = hashlib.blake2b(digest_size=16)
+    for header in sorted(Path(directory).rglob("*.h")):
+        digest.update(str(header).encode())
+        digest.update(header.read_bytes())
+    return digest.digest()
+
+# cl.exe flags shared by every compile; extra per-group flags (e.g. /arch:AVX2) are appended
+CL_FLAGS = (
+    "/c",            # Compile only (don't link)
+    "/MP",           # Compile the files in parallel inside this one process
+    "/O2",           # Optimize for speed
+    "/GL",           # Whole program optimization
+    "/MD",           # Use MSVCRT.lib
+    "/nologo",       # Suppress startup banner
+    "/W1",           # Warning level 1
+)
+
+def obj_cache_key(src_file, include_dirs, extra_flags):
+    """Cache key of the object built from src_file: the source, every header it could include,
+    the full compiler flags, the SDK include path (INCLUDE) and the MSVC toolset version (both
+    set by the Developer Command Prompt)"""
+    key = hashlib.blake2b(digest_size=16)
+    key.update(Path(src_file).read_bytes())
+    for directory in [str(Path(src_file).parent), *include_dirs]:
+        key.update(directory.encode())
+        key.update(headers_digest(directory))
+    key.update("\0".join([*CL_FLAGS, *extra_flags]).encode())
+    key.update(os.environ.get("INCLUDE", "").encode())
+    key.update(os.environ.get("VCToolsVersion", "").encode())
+    return key.hexdigest()
+
+def compile_sources(src_files, obj_dir, include_dirs, extra_flags=()):
+    """Compile source files from one directory into obj_dir with a single cl.exe /MP call,
+    returning (success, compiler output). Objects keep cl's default <stem>.obj names"""
+    obj_dir.mkdir(parents=True, exist_ok=True)
+    compile_cmd = [
+        "cl.exe",
+        *CL_FLAGS,
+        f"/Fo{obj_dir.absolute()}{os.sep}",  # Output directory for the object files
+    ]
+    compile_cmd.extend(extra_flags)
+    
+    # Sources go into a response file to stay clear of the command line length limit
+    rsp_file = obj_dir.with_suffix(".rsp")
+    rsp_file.write_text("".join(f'"{src_file}"\n' for src_file in src_files))
+    compile_cmd.append(f"@{rsp_file.absolute()}")
+    
+    # Include directories are passed through INCLUDE, ahead of the SDK directories already
+    # in it, so they are searched in the same order /I flags would be
+    env = dict(os.environ)
+    env["INCLUDE"] = os.pathsep.join([*include_dirs, env.get("INCLUDE", "")])
+    
+    # Compile without changing directory
+    result = subprocess.run(compile_cmd, capture_output=True, text=True, env=env)
+    return result.returncode == 0, f"Running: {' '.join(compile_cmd)}\n{result.stdout}{result.stderr}"
+
+def build_native_windows(target_platform, pqclean_source, pgo=False, full_ltcg=False):
     """Build native library for Windows"""
     
     if not Path(pqclean_source).exists():
@@ -115,6 +220,35 @@ def build_native_windows(target_platform, pqclean_source):
         c_files = list(algo_dir.glob("*.c"))
         source_files.extend([str(f.absolute()) for f in c_files])
     
+    # On x64, also build PQClean's AVX2 implementations next to the clean ones. They are
+    # compiled with /arch:AVX2 on their own, so the rest of the DLL runs on any x64 CPU; the
+    # wrappers only call the AVX2 symbols on CPUs that support them
+    avx2_files = set()
+    avx2_algorithms = []
+    uses_keccak4x = False
+    if arch == "x64" and os.environ.get("PQCHUB_AVX2", "1") == "1":
+        for algo in available_algorithms:
+            avx2_dir = pqclean_path / Path(algo).parent / "avx2"
+            if not avx2_dir.exists():
+                continue
+            # MSVC can't assemble PQClean's GNU-syntax .S files, so those variants stay clean-only
+            if any(avx2_dir.glob("*.S")) or any(avx2_dir.glob("*.s")):
+                print(f"[WARN] Skipping {avx2_dir.relative_to(pqclean_path)}: needs GNU assembler")
+                continue
+            print(f"[OK] Found: {avx2_dir.relative_to(pqclean_path).as_posix()}")
+            avx2_files.update(str(f.absolute()) for f in avx2_dir.glob("*.c"))
+            avx2_algorithms.append(f"{Path(algo).parent.as_posix()}/avx2")
+            uses_keccak4x = uses_keccak4x or any(
+                "fips202x4.h" in f.read_text(errors="ignore") for f in avx2_dir.glob("*.[ch]"))
+        # Some AVX2 implementations (not Falcon) hash through the 4-way Keccak in common/; it is
+        # only built when one of them is
+        if uses_keccak4x:
+            for common_file in ["fips202x4.c", "keccak4x/KeccakP-1600-times4-SIMD256.c"]:
+                common_path = common_dir / common_file
+                if common_path.exists():
+                    avx2_files.add(str(common_path.absolute()))
+        source_files.extend(sorted(avx2_files))
+    
     print(f"Found {len(source_files)} source files")
     print(f"Include directories: {len(include_dirs)}")
     
@@ -148,64 +282,23 @@ EXPORT const char* pqchub_get_platform(void) {
 }
 '''
     
-    # Create DEF file to export ALL algorithm functions (NIST standardized names)
+    # Create DEF file exporting the functions of every implementation actually built, so a
+    # missing algorithm never leaves an unresolved export behind
     def_file = build_dir / "pqc.def"
-    def_content = '''LIBRARY pqc
-EXPORTS
-    pqchub_get_version
-    pqchub_get_algorithms
-    pqchub_get_platform
-    
-    ; ML-KEM-512 (formerly Kyber512) - NIST FIPS 203
-    PQCLEAN_MLKEM512_CLEAN_crypto_kem_keypair
-    PQCLEAN_MLKEM512_CLEAN_crypto_kem_enc
-    PQCLEAN_MLKEM512_CLEAN_crypto_kem_dec
-    
-    ; ML-KEM-768 (formerly Kyber768) - NIST FIPS 203
-    PQCLEAN_MLKEM768_CLEAN_crypto_kem_keypair
-    PQCLEAN_MLKEM768_CLEAN_crypto_kem_enc
-    PQCLEAN_MLKEM768_CLEAN_crypto_kem_dec
-    
-    ; ML-KEM-1024 (formerly Kyber1024) - NIST FIPS 203
-    PQCLEAN_MLKEM1024_CLEAN_crypto_kem_keypair
-    PQCLEAN_MLKEM1024_CLEAN_crypto_kem_enc
-    PQCLEAN_MLKEM1024_CLEAN_crypto_kem_dec
-    
-    ; ML-DSA-44 (formerly Dilithium2) - NIST FIPS 204
-    PQCLEAN_MLDSA44_CLEAN_crypto_sign_keypair
-    PQCLEAN_MLDSA44_CLEAN_crypto_sign
-    PQCLEAN_MLDSA44_CLEAN_crypto_sign_open
-    PQCLEAN_MLDSA44_CLEAN_crypto_sign_signature
-    PQCLEAN_MLDSA44_CLEAN_crypto_sign_verify
-    
-    ; ML-DSA-65 (formerly Dilithium3) - NIST FIPS 204
-    PQCLEAN_MLDSA65_CLEAN_crypto_sign_keypair
-    PQCLEAN_MLDSA65_CLEAN_crypto_sign
-    PQCLEAN_MLDSA65_CLEAN_crypto_sign_open
-    PQCLEAN_MLDSA65_CLEAN_crypto_sign_signature
-    PQCLEAN_MLDSA65_CLEAN_crypto_sign_verify
-    
-    ; ML-DSA-87 (formerly Dilithium5) - NIST FIPS 204
-    PQCLEAN_MLDSA87_CLEAN_crypto_sign_keypair
-    PQCLEAN_MLDSA87_CLEAN_crypto_sign
-    PQCLEAN_MLDSA87_CLEAN_crypto_sign_open
-    PQCLEAN_MLDSA87_CLEAN_crypto_sign_signature
-    PQCLEAN_MLDSA87_CLEAN_crypto_sign_verify
-    
-    ; Falcon-512 Signature - NIST alternative
-    PQCLEAN_FALCON512_CLEAN_crypto_sign_keypair
-    PQCLEAN_FALCON512_CLEAN_crypto_sign
-    PQCLEAN_FALCON512_CLEAN_crypto_sign_open
-    PQCLEAN_FALCON512_CLEAN_crypto_sign_signature
-    PQCLEAN_FALCON512_CLEAN_crypto_sign_verify
-    
-    ; Falcon-1024 Signature - NIST alternative
-    PQCLEAN_FALCON1024_CLEAN_crypto_sign_keypair
-    PQCLEAN_FALCON1024_CLEAN_crypto_sign
-    PQCLEAN_FALCON1024_CLEAN_crypto_sign_open
-    PQCLEAN_FALCON1024_CLEAN_crypto_sign_signature
-    PQCLEAN_FALCON1024_CLEAN_crypto_sign_verify
-'''
+    def_lines = [
+        "LIBRARY pqc",
+        "EXPORTS",
+        "    pqchub_get_version",
+        "    pqchub_get_algorithms",
+        "    pqchub_get_platform",
+    ]
+    for algo in available_algorithms + avx2_algorithms:
+        prefix = symbol_prefix(algo)
+        functions = KEM_FUNCTIONS if algo.startswith("crypto_kem/") else SIGN_FUNCTIONS
+        def_lines.append("    ")
+        def_lines.append(f"    ; {algo}")
+        def_lines.extend(f"    {prefix}_{name}" for name in functions)
+    def_content = "\n".join(def_lines) + "\n"
     
     with open(wrapper_file, 'w') as f:
         f.write(wrapper_content)
@@ -215,56 +308,78 @@ EXPORTS
     
     source_files.append(str(wrapper_file.absolute()))
     
-    # Step 1: Compile each source file to object file with unique names
+    # Step 1: Compile the source files to object files, one cl.exe per source directory.
+    # PQClean reuses file names across algorithms (poly.c, ntt.c, ...) but never within one
+    # directory, so each directory gets its own object directory and cl's default names
     print("Compiling source files to object files...")
-    obj_files = []
-    obj_counter = 0
-    
+    groups = {}
     for src_file in source_files:
-        # Create unique object file name
-        obj_file = build_dir / f"obj_{obj_counter}.obj"
-        obj_files.append(str(obj_file.absolute()))
-        obj_counter += 1
-        
-        # Compile this source file
-        compile_cmd = [
-            "cl.exe",
-            "/c",            # Compile only (don't link)
-            "/O2",           # Optimize for speed
-            "/GL",           # Whole program optimization
-            "/MD",           # Use MSVCRT.lib
-            "/nologo",       # Suppress startup banner
-            "/W1",           # Warning level 1
-        ]
-        
-        # Add include directories
-        for include_dir in include_dirs:
-            compile_cmd.append(f"/I{include_dir}")
-        
-        # Add source file and output object file
-        compile_cmd.append(src_file)
-        compile_cmd.append(f"/Fo{obj_file.absolute()}")
-        
-        # Compile without changing directory
-        success = run_command(compile_cmd)
-        if not success:
-            print(f"[ERROR] Failed to compile: {src_file}")
-            return False
+        extra_flags = ("/arch:AVX2",) if src_file in avx2_files else ()
+        groups.setdefault((str(Path(src_file).parent), extra_flags), []).append(src_file)
+    
+    # Objects are cached in build_dir/.cache under a hash of their inputs, so a rebuild only
+    # compiles the sources whose code, headers, flags or toolchain changed
+    cache_dir = build_dir / ".cache"
+    cache_dir.mkdir(exist_ok=True)
+    obj_files = []
+    jobs = []
+    to_compile = {}
+    for group_counter, ((_, extra_flags), src_files) in enumerate(groups.items()):
+        obj_dir = build_dir / f"obj_{group_counter}"
+        obj_dir.mkdir(exist_ok=True)
+        misses = []
+        for src_file in src_files:
+            obj_file = obj_dir / f"{Path(src_file).stem}.obj"
+            obj_files.append(str(obj_file.absolute()))
+            cache_file = cache_dir / f"{obj_cache_key(src_file, include_dirs, extra_flags)}.obj"
+            if cache_file.exists():
+                shutil.copyfile(cache_file, obj_file)
+            else:
+                misses.append(src_file)
+                to_compile[obj_file] = cache_file
+        if misses:
+            jobs.append((misses, obj_dir, extra_flags))
+    print(f"{len(obj_files) - len(to_compile)} object files cached, compiling {len(to_compile)}")
+    
+    # The directories are independent, so their cl.exe processes also run side by side;
+    # output is only printed for a directory that fails
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        futures = {executor.submit(compile_sources, src_files, obj_dir, include_dirs, extra_flags): src_files
+                   for src_files, obj_dir, extra_flags in jobs}
+        for future in as_completed(futures):
+            success, output = future.result()
+            if not success:
+                print(output)
+                print(f"[ERROR] Failed to compile: {Path(futures[future][0]).parent}")
+                for pending in futures:
+                    pending.cancel()
+                return False
+    
+    for obj_file, cache_file in to_compile.items():
+        shutil.copyfile(obj_file, cache_file)
     
     print(f"Successfully compiled {len(obj_files)} object files")
     
     # Step 2: Link all object files into DLL
     print("Linking DLL...")
+    # Incremental LTCG only re-optimises the functions whose objects changed, using the state
+    # kept in build_dir between runs. Release (--full-ltcg) and PGO builds always do a full pass
+    if pgo or full_ltcg:
+        ltcg = ["/LTCG"]
+    else:
+        ltcg = ["/LTCG:INCREMENTAL", f"/LTCGOUT:{(build_dir / 'pqc.iobj').absolute()}"]
     link_cmd = [
         "link.exe",
         "/DLL",                      # Create DLL
-        "/LTCG",                     # Link-time code generation
+        *ltcg,                       # Link-time code generation
         "/nologo",                   # Suppress startup banner
         f"/OUT:{output_lib.absolute()}",  # Output file
     ]
     
-    # Add all object files
-    link_cmd.extend(obj_files)
+    # Add all object files through a response file, clear of the command line length limit
+    link_rsp = build_dir / "link.rsp"
+    link_rsp.write_text("".join(f'"{obj_file}"\n' for obj_file in obj_files))
+    link_cmd.append(f"@{link_rsp.absolute()}")
     
     # Add DEF file to export Falcon functions
     link_cmd.append(f"/DEF:{def_file.absolute()}")
@@ -272,6 +387,29 @@ EXPORTS
     # Add necessary libraries
     link_cmd.append("advapi32.lib")
     
+    # Optional profile-guided optimisation: link an instrumented DLL, train it, then relink
+    # using the profile. The objects are already /GL, so nothing has to be recompiled.
+    # Training loads the DLL, so it needs a Python of the same bitness
+    if pgo and (struct.calcsize("P") * 8 == 64) != (arch == "x64"):
+        print(f"[WARN] PGO needs a Python build matching {arch} to train the DLL, skipping it")
+        pgo = False
+    if pgo:
+        pgd_file = (build_dir / "pqc.pgd").absolute()
+        print("Linking instrumented DLL for PGO...")
+        if not run_command(link_cmd + [f"/GENPROFILE:PGD={pgd_file}"]):
+            return False
+        trainer_file = build_dir / "pgo_train.py"
+        trainer_file.write_text(PGO_TRAINER)
+        print("Running PGO training workload...")
+        # The instrumented DLL lives in the output directory; VCPROFILE_PATH makes it write its
+        # pqc!N.pgc counts next to the .pgd instead, where /USEPROFILE merges them and cleanup
+        # removes them
+        train_env = dict(os.environ, VCPROFILE_PATH=str(build_dir.absolute()))
+        if not run_command([sys.executable, str(trainer_file.absolute()), str(output_lib.absolute())],
+                           env=train_env):
+            return False
+        link_cmd.append(f"/USEPROFILE:PGD={pgd_file}")
+    
     # Link without changing directory
     success = run_command(link_cmd)
     
@@ -285,7 +423,7 @@ EXPORTS
         
         # Clean up build directory artifacts (only temporary object files)
         # Keep .lib and .exp in output directory as they're needed for linking
-        for pattern in ["*.obj", "*.pdb"]:
+        for pattern in ["obj_*/*.obj", "*.pdb", "*.rsp", "*.pgd", "*.pgc"]:
             for file in build_dir.glob(pattern):
                 try:
                     file.unlink()
@@ -298,15 +436,20 @@ EXPORTS
         return False
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python build_native.py <target_platform> <pqclean_source>")
-        print("Example: python build_native.py windows-x64 pqclean")
-        sys.exit(1)
-    
-    target_platform = sys.argv[1]
-    pqclean_source = sys.argv[2]
-    
-    success = build_native_windows(target_platform, pqclean_source)
+    parser = argparse.ArgumentParser(description="Build the PQC native library for Windows",
+                                     epilog="Example: python build_native.py windows-x64 pqclean")
+    parser.add_argument("target_platform", help="windows-x64 or windows-x86")
+    parser.add_argument("pqclean_source", help="PQClean source directory")
+    # Same switch as build_native.sh: --pgo or PQCHUB_PGO=1
+    parser.add_argument("--pgo", action="store_true",
+                       help="profile-guided build: instrument, train on every algorithm, relink")
+    parser.add_argument("--full-ltcg", action="store_true",
+                       help="full link-time code generation instead of incremental (release builds)")
+    
+    args = parser.parse_args()
+    pgo = args.pgo or os.environ.get("PQCHUB_PGO", "0") == "1"
+    
+    success = build_native_windows(args.target_platform, args.pqclean_source, pgo, args.full_ltcg)
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
@@ -124,7 +124,30 @@ for algo in "${AVAILABLE_ALGORITHMS[@]}"; do
     done < <(find "$algo_dir" -name "*.c" -print0)
 done
 
-echo "Found ${#SOURCE_FILES[@]} source files"
+# x86_64 builds also get PQClean's AVX2 implementations where the source tree has them. They
+# are compiled on their own with the AVX2 flags (see compile_objects), so the rest of the library
+# stays baseline x86-64; the wrappers only call the AVX2 symbols on CPUs that report avx2
+# (PQCHUB_AVX2=0 skips)
+AVX2_SOURCES=()
+if [[ "$TARGET_PLATFORM" == *-x86_64 ]] && [ "${PQCHUB_AVX2:-1}" = "1" ]; then
+    for algo in "${AVAILABLE_ALGORITHMS[@]}"; do
+        avx2_algo_dir="$PQCLEAN_SOURCE/${algo%/clean}/avx2"
+        [ -d "$avx2_algo_dir" ] || continue
+        echo "✓ Found: ${algo%/clean}/avx2"
+        while IFS= read -r -d '' file; do
+            AVX2_SOURCES+=("$file")
+        done < <(find "$avx2_algo_dir" \( -name "*.c" -o -name "*.S" \) -print0)
+    done
+    # The AVX2 implementations sample and hash through PQClean's 4-way Keccak in common/
+    if [ ${#AVX2_SOURCES[@]} -gt 0 ]; then
+        for common_file in fips202x4.c keccak4x/KeccakP-1600-times4-SIMD256.c; do
+            [ -f "$COMMON_DIR/$common_file" ] || continue
+            AVX2_SOURCES+=("$COMMON_DIR/$common_file")
+        done
+    fi
+fi
+
+echo "Found ${#SOURCE_FILES[@]} source files (+${#AVX2_SOURCES[@]} AVX2 sources)"
 echo "Include directories: ${INCLUDE_DIRS[*]}"
 
 # Create wrapper C file that exports all functions
@@ -212,9 +235,129 @@ EOF
 # Add wrapper to source files
 SOURCE_FILES+=("$WRAPPER_FILE")
 
+# Compile every source to its own numbered object in $BUILD_DIR/obj, with any extra flags given.
+# PQClean repeats file names across algorithms (poly.c, ntt.c, sign.c, ...) and GCC names profile
+# data after the object, so the numbering keeps PGO profiles apart; both passes reuse the names.
+# The AVX2 sources go through the same passes, with their own flags and include path
+compile_objects() {
+    OBJECTS=()
+    mkdir -p "$BUILD_DIR/obj"
+    local i=0
+    for file in "${SOURCE_FILES[@]}"; do
+        local obj="$BUILD_DIR/obj/obj_$i.o"
+        $CC $CFLAGS "$@" "${INCLUDE_DIRS[@]}" -c "$file" -o "$obj"
+        OBJECTS+=("$obj")
+        i=$((i + 1))
+    done
+    for file in ${AVX2_SOURCES[@]+"${AVX2_SOURCES[@]}"}; do
+        local obj="$BUILD_DIR/obj/obj_$i.o"
+        $CC $CFLAGS "$@" -mavx2 -mbmi2 -mpopcnt -mfma -maes "-I$COMMON_DIR" -c "$file" -o "$obj"
+        OBJECTS+=("$obj")
+        i=$((i + 1))
+    done
+}
+
+# Optional profile-guided optimisation (PQCHUB_PGO=1): build an instrumented library, run a
+# training workload over every algorithm, then rebuild using the recorded profile.
+# Needs GCC and a native (non-cross) Linux build, since the training run executes the library
+if [ "${PQCHUB_PGO:-0}" = "1" ]; then
+    HOST_ARCH="$(uname -m)"
+    if [[ "$TARGET_PLATFORM" != "linux-$HOST_ARCH" ]] || ! "$CC" -v 2>&1 | grep -q "gcc version"; then
+        echo "⚠ PGO needs a native GCC Linux build, skipping it for $TARGET_PLATFORM"
+    else
+        PGO_DIR="$(pwd)/$BUILD_DIR/pgo"
+        TRAINER_FILE="$BUILD_DIR/pgo_train.c"
+        cat > "$TRAINER_FILE" << 'EOF'
+/*
+ * PQChub PGO training run
+ * Exercises key generation, encapsulation/decapsulation and signing/verification of every
+ * algorithm present in the library, over a spread of message sizes. The AVX2 implementations
+ * are trained too when the library has them and this CPU can run them
+ */
+#include <dlfcn.h>
+#include <stdio.h>
+#include <string.h>
+
+typedef int (*keypair_fn)(unsigned char *, unsigned char *);
+typedef int (*kem_fn)(unsigned char *, unsigned char *, const unsigned char *);
+typedef int (*sign_fn)(unsigned char *, size_t *, const unsigned char *, size_t, const unsigned char *);
+
+static unsigned char pk[8192], sk[8192], ct[8192], ss[64], msg[16384], sm[16384 + 8192], out[16384 + 8192];
+
+static void *sym(void *lib, const char *alg, const char *impl, const char *name) {
+    char full[128];
+    snprintf(full, sizeof full, "PQCLEAN_%s_%s_%s", alg, impl, name);
+    return dlsym(lib, full);
+}
+
+/* Same CPU features the wrappers require before they pick the AVX2 symbols */
+static int cpu_has_avx2(void) {
+#if defined(__x86_64__)
+    __builtin_cpu_init();
+    return __builtin_cpu_supports("avx2") && __builtin_cpu_supports("bmi2") &&
+           __builtin_cpu_supports("popcnt") && __builtin_cpu_supports("fma");
+#else
+    return 0;
+#endif
+}
+
+int main(int argc, char **argv) {
+    static const char *kems[] = {"MLKEM512", "MLKEM768", "MLKEM1024"};
+    static const char *sigs[] = {"MLDSA44", "MLDSA65", "MLDSA87", "FALCON512", "FALCON1024"};
+    static const char *impls[] = {"CLEAN", "AVX2"};
+    size_t nimpls = cpu_has_avx2() ? 2 : 1;
+    static const size_t sizes[] = {32, 256, 1024, 16384};
+    void *lib = argc > 1 ? dlopen(argv[1], RTLD_NOW) : NULL;
+    if (!lib) {
+        fprintf(stderr, "cannot load library: %s\n", dlerror());
+        return 1;
+    }
+    memset(msg, 0x5a, sizeof msg);
+    for (size_t n = 0; n < nimpls; n++) {
+        for (size_t a = 0; a < sizeof kems / sizeof *kems; a++) {
+            keypair_fn keypair = (keypair_fn)sym(lib, kems[a], impls[n], "crypto_kem_keypair");
+            kem_fn enc = (kem_fn)sym(lib, kems[a], impls[n], "crypto_kem_enc");
+            kem_fn dec = (kem_fn)sym(lib, kems[a], impls[n], "crypto_kem_dec");
+            if (!keypair || !enc || !dec) continue;
+            for (int i = 0; i < 200; i++) {
+                keypair(pk, sk);
+                enc(ct, ss, pk);
+                dec(ss, ct, sk);
+            }
+        }
+        for (size_t a = 0; a < sizeof sigs / sizeof *sigs; a++) {
+            keypair_fn keypair = (keypair_fn)sym(lib, sigs[a], impls[n], "crypto_sign_keypair");
+            sign_fn sign = (sign_fn)sym(lib, sigs[a], impls[n], "crypto_sign");
+            sign_fn open = (sign_fn)sym(lib, sigs[a], impls[n], "crypto_sign_open");
+            if (!keypair || !sign || !open) continue;
+            for (int i = 0; i < 20; i++) {
+                keypair(pk, sk);
+                for (size_t s = 0; s < sizeof sizes / sizeof *sizes; s++) {
+                    size_t smlen, mlen;
+                    sign(sm, &smlen, msg, sizes[s], sk);
+                    open(out, &mlen, sm, smlen, pk);
+                }
+            }
+        }
+    }
+    dlclose(lib);
+    return 0;
+}
+EOF
+        echo "Building instrumented library for PGO..."
+        compile_objects -fprofile-generate="$PGO_DIR"
+        $CC $CFLAGS -fprofile-generate="$PGO_DIR" "${OBJECTS[@]}" $LDFLAGS -o "$OUTPUT_LIB"
+        $CC -O2 "$TRAINER_FILE" -o "$BUILD_DIR/pgo_train" -ldl
+        echo "Running PGO training workload..."
+        "$BUILD_DIR/pgo_train" "$OUTPUT_LIB"
+        CFLAGS="$CFLAGS -fprofile-use=$PGO_DIR -fprofile-partial-training -Wno-missing-profile"
+    fi
+fi
+
 # Compile the shared library
 echo "Compiling shared library..."
-$CC $CFLAGS "${INCLUDE_DIRS[@]}" "${SOURCE_FILES[@]}" $LDFLAGS -o "$OUTPUT_LIB"
+compile_objects
+$CC $CFLAGS "${OBJECTS[@]}" $LDFLAGS -o "$OUTPUT_LIB"
 
 if [ -f "$OUTPUT_LIB" ]; then
     echo "✅ Successfully built: $OUTPUT_LIB"
@@ -9,38 +9,35 @@ import os
 import sys
 import urllib.request
 import tarfile
-import zipfile
 import shutil
 from pathlib import Path
 
-def download_file(url, dest_path):
-    """Download a file from URL to destination path"""
-    print(f"Downloading {url}")
-    try:
-        urllib.request.urlretrieve(url, dest_path)
-        print(f"Downloaded to {dest_path}")
-        return True
-    except Exception as e:
-        print(f"Error downloading {url}: {e}")
-        return False
+def strip_top_dir(tar):
+    """Yield the archive members with their top-level directory removed from the path"""
+    for member in tar:
+        member.name = member.name.partition("/")[2]
+        if member.islnk():
+            member.linkname = member.linkname.partition("/")[2]
+        if member.name:
+            yield member
 
-def extract_archive(archive_path, extract_to):
-    """Extract tar.gz or zip archive"""
-    print(f"Extracting {archive_path}")
+def download_and_extract(url, extract_to):
+    """Download a tar.gz archive from URL and extract its contents, without the top-level
+    directory, while it downloads"""
+    print(f"Downloading and extracting {url}")
     try:
-        if archive_path.endswith('.tar.gz'):
-            with tarfile.open(archive_path, 'r:gz') as tar:
-                tar.extractall(extract_to)
-        elif archive_path.endswith('.zip'):
-            with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_to)
-        else:
-            print(f"Unsupported archive format: {archive_path}")
-            return False
+        # Streaming mode ("r|gz") reads the response front to back without seeking, so the
+        # archive is never written to disk and extraction overlaps the download
+        with urllib.request.urlopen(url, timeout=60) as response, \
+             tarfile.open(fileobj=response, mode='r|gz') as tar:
+            if hasattr(tarfile, "data_filter"):
+                tar.extractall(extract_to, members=strip_top_dir(tar), filter="data")
+            else:
+                tar.extractall(extract_to, members=strip_top_dir(tar))
         print(f"Extracted to {extract_to}")
         return True
     except Exception as e:
-        print(f"Error extracting {archive_path}: {e}")
+        print(f"Error downloading {url}: {e}")
         return False
 
 def download_pqclean(ref="master", output_dir="pqclean", force=False):
@@ -63,41 +60,12 @@ def download_pqclean(ref="master", output_dir="pqclean", force=False):
     
     # Download URL for the specified reference
     archive_url = f"https://github.com/PQClean/PQClean/archive/{ref}.tar.gz"
-    archive_file = output_path / f"PQClean-{ref}.tar.gz"
     
-    # Download the archive
-    if not download_file(archive_url, archive_file):
+    # Download and extract the archive straight into the output directory; GitHub wraps the
+    # sources in a PQClean-{ref}/ directory, which is stripped on the way
+    if not download_and_extract(archive_url, str(output_path)):
         return False
     
-    # Extract the archive
-    temp_extract = output_path / "temp"
-    temp_extract.mkdir(exist_ok=True)
-    
-    if not extract_archive(str(archive_file), str(temp_extract)):
-        return False
-    
-    # Find the extracted directory (should be PQClean-{ref})
-    extracted_dirs = list(temp_extract.glob("PQClean-*"))
-    if not extracted_dirs:
-        print("Error: Could not find extracted PQClean directory")
-        return False
-    
-    source_dir = extracted_dirs[0]
-    
-    # Move contents to output directory
-    for item in source_dir.iterdir():
-        dest = output_path / item.name
-        if dest.exists():
-            if dest.is_dir():
-                shutil.rmtree(dest)
-            else:
-                dest.unlink()
-        shutil.move(str(item), str(dest))
-    
-    # Clean up
-    shutil.rmtree(temp_extract)
-    archive_file.unlink()
-    
     print(f"[SUCCESS] PQClean {ref} downloaded successfully to {output_path}")
     
     # Verify essential directories exist
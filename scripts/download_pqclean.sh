@@ -25,29 +25,20 @@ mkdir -p "$OUTPUT_DIR"
 
 # Download URL
 ARCHIVE_URL="https://github.com/PQClean/PQClean/archive/${PQCLEAN_REF}.tar.gz"
-ARCHIVE_FILE="$OUTPUT_DIR/PQClean-${PQCLEAN_REF}.tar.gz"
 
-echo "Downloading $ARCHIVE_URL"
+echo "Downloading and extracting $ARCHIVE_URL"
 
-# Download with curl or wget
+# Pipe the download straight into tar, so the archive never touches the disk and
+# extraction overlaps the download (pipefail catches a failed download)
 if command -v curl >/dev/null 2>&1; then
-    curl -L -o "$ARCHIVE_FILE" "$ARCHIVE_URL"
+    curl -fL "$ARCHIVE_URL" | tar -xz -C "$OUTPUT_DIR" --strip-components=1
 elif command -v wget >/dev/null 2>&1; then
-    wget -O "$ARCHIVE_FILE" "$ARCHIVE_URL"
+    wget -O - "$ARCHIVE_URL" | tar -xz -C "$OUTPUT_DIR" --strip-components=1
 else
     echo "Error: Neither curl nor wget found"
     exit 1
 fi
 
-echo "Downloaded to $ARCHIVE_FILE"
-
-# Extract archive
-echo "Extracting $ARCHIVE_FILE"
-tar -xzf "$ARCHIVE_FILE" -C "$OUTPUT_DIR" --strip-components=1
-
-# Clean up archive
-rm "$ARCHIVE_FILE"
-
 echo "✅ PQClean $PQCLEAN_REF downloaded successfully to $OUTPUT_DIR"
 
 # Verify essential directories exist
@@ -95,7 +95,7 @@ try:
     
     # Sign message
     message = b"Test message for Falcon-512"
-    signed = ctypes.create_string_buffer(len(message) + 666)
+    signed = ctypes.create_string_buffer(len(message) + 752)
     signed_len = ctypes.c_size_t()
     
     result = lib.PQCLEAN_FALCON512_CLEAN_crypto_sign(
@@ -144,7 +144,7 @@ try:
     
     # Sign message
     message = b"Test message for Falcon-1024"
-    signed = ctypes.create_string_buffer(len(message) + 1280)
+    signed = ctypes.create_string_buffer(len(message) + 1462)
     signed_len = ctypes.c_size_t()
     
     result = lib.PQCLEAN_FALCON1024_CLEAN_crypto_sign(
@@ -189,7 +189,7 @@ try:
     message = b"Consistency test message"
     
     # First signature
-    signed1 = ctypes.create_string_buffer(len(message) + 666)
+    signed1 = ctypes.create_string_buffer(len(message) + 752)
     signed1_len = ctypes.c_size_t()
     lib.PQCLEAN_FALCON512_CLEAN_crypto_sign(
         signed1, ctypes.byref(signed1_len),
@@ -197,7 +197,7 @@ try:
     )
     
     # Second signature
-    signed2 = ctypes.create_string_buffer(len(message) + 666)
+    signed2 = ctypes.create_string_buffer(len(message) + 752)
     signed2_len = ctypes.c_size_t()
     lib.PQCLEAN_FALCON512_CLEAN_crypto_sign(
         signed2, ctypes.byref(signed2_len),
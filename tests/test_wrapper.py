@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+PQChub Python Wrapper Test
+Round-trip tests of the example wrapper's buffer, batch, zero-copy and async APIs,
+and of the download resume and checksum paths
+"""
+
+import os
+import sys
+import array
+import hashlib
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+# The wrapper lives in examples/python; it finds the library in bins/<platform>, which has the
+# same layout as its download cache, so nothing is downloaded
+repo_root = Path(__file__).parent.parent
+sys.path.insert(0, str(repo_root / "examples" / "python"))
+from utils import detect_platform, download_file, MLKEM512, MLKEM768, MLKEM1024, MLDSA44, MLDSA65, MLDSA87, Falcon512, Falcon1024
+from utils.bin import METADATA_URL, LIBRARY_SUFFIXES
+
+CACHE_DIR = repo_root / "bins"
+platform_dir = CACHE_DIR / detect_platform()
+if not platform_dir.is_dir() or not any(f.name.endswith(LIBRARY_SUFFIXES) for f in platform_dir.iterdir()):
+    print(f"[ERROR] Binary not found in: {platform_dir}")
+    sys.exit(1)
+print(f"[INFO] Using binary from: {platform_dir}")
+
+KEMS = [MLKEM512, MLKEM768, MLKEM1024]
+SIGNATURES = [MLDSA44, MLDSA65, MLDSA87, Falcon512, Falcon1024]
+MESSAGE = b"Test message for the PQChub wrapper"
+
+tests_passed = 0
+tests_failed = 0
+
+def check(condition, message):
+    if not condition:
+        raise Exception(message)
+
+def check_raises(exc_type, fn, *args):
+    try:
+        fn(*args)
+    except exc_type:
+        return
+    raise Exception(f"{fn.__name__} did not raise {exc_type.__name__}")
+
+def tampered(signed_message):
+    # Flipping the first byte breaks the signature (ML-DSA) or its header (Falcon)
+    data = bytearray(signed_message)
+    data[0] ^= 0x01
+    return bytes(data)
+
+def run(name, test):
+    global tests_passed, tests_failed
+    print(f"\n[TEST] {name}")
+    try:
+        test()
+        print(f"  [SUCCESS] {name} test passed")
+        tests_passed += 1
+    except Exception as e:
+        print(f"  [FAILED] {name} test failed: {e}")
+        tests_failed += 1
+
+def test_round_trips():
+    for kem_class in KEMS:
+        kem = kem_class(METADATA_URL, CACHE_DIR)
+        pk, sk = kem.keypair()
+        check((len(pk), len(sk)) == (kem.PUBLICKEY_BYTES, kem.SECRETKEY_BYTES), "wrong key sizes")
+        ct, ss = kem.encapsulate(pk)
+        check(kem.decapsulate(ct, sk) == ss, "shared secrets differ")
+        print(f"  [OK] {kem_class.__name__}")
+    for sig_class in SIGNATURES:
+        sig = sig_class(METADATA_URL, CACHE_DIR)
+        pk, sk = sig.keypair()
+        signed = sig.sign(MESSAGE, sk)
+        check(len(signed) <= len(MESSAGE) + sig.SIGNATURE_BYTES, "signature too long")
+        check(sig.verify(signed, pk) == MESSAGE, "verified message differs")
+        check(sig.verify_only(signed, pk), "verify_only rejected a valid signature")
+        print(f"  [OK] {sig_class.__name__}")
+
+def test_into():
+    kem = MLKEM768(METADATA_URL, CACHE_DIR)
+    pk, sk = bytearray(kem.PUBLICKEY_BYTES), bytearray(kem.SECRETKEY_BYTES)
+    kem.keypair_into(pk, sk)
+    ct, ss = bytearray(kem.CIPHERTEXT_BYTES), bytearray(kem.SHAREDSECRET_BYTES)
+    kem.encapsulate_into(pk, ct, ss)
+    check(kem.decapsulate(ct, sk) == ss, "encapsulate_into secret doesn't decapsulate")
+    ss2 = bytearray(kem.SHAREDSECRET_BYTES)
+    kem.decapsulate_into(ct, sk, ss2)
+    check(ss2 == ss, "decapsulate_into secret differs")
+    print("  [OK] keypair_into, encapsulate_into, decapsulate_into")
+
+    sig = MLDSA44(METADATA_URL, CACHE_DIR)
+    pk, sk = bytearray(sig.PUBLICKEY_BYTES), bytearray(sig.SECRETKEY_BYTES)
+    sig.keypair_into(pk, sk)
+    out = bytearray(len(MESSAGE) + sig.SIGNATURE_BYTES)
+    n = sig.sign_into(MESSAGE, sk, out)
+    check(sig.verify(bytes(out[:n]), pk) == MESSAGE, "sign_into output doesn't verify")
+    print("  [OK] keypair_into, sign_into")
+
+def test_too_small_buffers():
+    kem = MLKEM512(METADATA_URL, CACHE_DIR)
+    pk, sk = kem.keypair()
+    ct, _ = kem.encapsulate(pk)
+    check_raises(ValueError, kem.keypair_into, bytearray(kem.PUBLICKEY_BYTES - 1), bytearray(kem.SECRETKEY_BYTES))
+    check_raises(ValueError, kem.encapsulate_into, pk, bytearray(kem.CIPHERTEXT_BYTES - 1), bytearray(kem.SHAREDSECRET_BYTES))
+    check_raises(ValueError, kem.decapsulate_into, ct, sk, bytearray(kem.SHAREDSECRET_BYTES - 1))
+    sig = Falcon512(METADATA_URL, CACHE_DIR)
+    _, sk = sig.keypair()
+    check_raises(ValueError, sig.sign_into, MESSAGE, sk, bytearray(len(MESSAGE) + sig.SIGNATURE_BYTES - 1))
+    print("  [OK] every *_into variant rejects an undersized buffer")
+
+def test_batches():
+    kem = MLKEM1024(METADATA_URL, CACHE_DIR)
+    pks, sks = kem.keypair_batch(3)
+    check(len(pks) == len(sks) == 3, "keypair_batch returned the wrong count")
+    for pk, sk in zip(pks, sks):
+        ct, ss = kem.encapsulate(pk)
+        check(kem.decapsulate(ct, sk) == ss, "keypair_batch key pair doesn't work")
+    cts, sss = kem.encapsulate_batch(pks[0], 4)
+    check(len(cts) == len(sss) == 4, "encapsulate_batch returned the wrong count")
+    for ct, ss in zip(cts, sss):
+        check(kem.decapsulate(ct, sks[0]) == ss, "encapsulate_batch secret doesn't decapsulate")
+    check(kem.keypair_batch(0) == ([], []) and kem.encapsulate_batch(pks[0], 0) == ([], []), "empty batch isn't empty")
+    print("  [OK] keypair_batch, encapsulate_batch")
+
+    sig = MLDSA65(METADATA_URL, CACHE_DIR)
+    pks, sks = sig.keypair_batch(2)
+    pk, sk = pks[1], sks[1]
+    messages = [b"", MESSAGE, MESSAGE * 100]
+    signed = sig.sign_many(messages, sk)
+    check([sig.verify(sm, pk) for sm in signed] == messages, "sign_many output doesn't verify")
+    batch = signed + [tampered(signed[1])]
+    check(sig.verify_many(batch, pk) == [sig.verify_only(sm, pk) for sm in batch] == [True, True, True, False],
+          "verify_many differs from verify_only")
+    check(sig.sign_many([], sk) == [] and sig.verify_many([], pk) == [], "empty batch isn't empty")
+    print("  [OK] keypair_batch, sign_many, verify_many")
+
+def test_tampered():
+    for sig_class in (MLDSA87, Falcon1024):
+        sig = sig_class(METADATA_URL, CACHE_DIR)
+        pk, sk = sig.keypair()
+        bad = tampered(sig.sign(MESSAGE, sk))
+        check(not sig.verify_only(bad, pk), "verify_only accepted a tampered message")
+        check(sig.verify_many([bad], pk) == [False], "verify_many accepted a tampered message")
+        check_raises(Exception, sig.verify, bad, pk)
+        print(f"  [OK] {sig_class.__name__} rejects a tampered signed message")
+
+def test_zerocopy():
+    sig = MLDSA44(METADATA_URL, CACHE_DIR)
+    pk, sk = sig.keypair()
+    # Multi-byte items: the whole buffer is signed, not one byte per item
+    words = array.array("I", range(16))
+    signed = sig.sign(memoryview(words), bytearray(sk), zerocopy=True)
+    check(sig.verify(bytearray(signed), pk, zerocopy=True) == words.tobytes(), "wide-item view signed partially")
+    # Non-contiguous views fall back to a copy
+    strided = memoryview(bytearray(MESSAGE))[::2]
+    check(sig.verify(sig.sign(strided, sk, zerocopy=True), pk) == bytes(strided), "strided view mis-signed")
+    kem = MLKEM512(METADATA_URL, CACHE_DIR)
+    pk, sk = kem.keypair()
+    ct, ss = kem.encapsulate(bytearray(pk), zerocopy=True)
+    check(kem.decapsulate(bytearray(ct), bytearray(sk), zerocopy=True) == ss, "zero-copy KEM round trip failed")
+    print("  [OK] zerocopy=True on sign, verify, encapsulate and decapsulate")
+
+def test_async():
+    sig = Falcon512(METADATA_URL, CACHE_DIR)
+    pk, sk = sig.keypair()
+    futures = [sig.sign_async(MESSAGE + bytes([i]), sk) for i in range(8)]
+    checks = [sig.verify_async(f.result(), pk) for f in futures]
+    check([f.result() for f in checks] == [MESSAGE + bytes([i]) for i in range(8)], "async results differ")
+    print("  [OK] sign_async, verify_async")
+
+# Served by the local HTTP server below, with Range support so resumed downloads can be checked
+PAYLOAD = os.urandom(300_000)
+
+class RangeHandler(BaseHTTPRequestHandler):
+    ranges = []
+    def do_GET(self):
+        requested = self.headers.get("Range")
+        self.ranges.append(requested)
+        start = int(requested.split("=")[1].rstrip("-")) if requested else 0
+        if start >= len(PAYLOAD):
+            self.send_response(416)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = PAYLOAD[start:]
+        self.send_response(206 if requested else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    def log_message(self, *args):
+        pass
+
+def test_download():
+    server = HTTPServer(("127.0.0.1", 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/libpqc.so"
+    sha256 = hashlib.sha256(PAYLOAD).hexdigest()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            dest = os.path.join(tmp, "cache", "libpqc.so")
+            download_file(url, dest, sha256)
+            check(Path(dest).read_bytes() == PAYLOAD and not os.path.exists(f"{dest}.part"), "fresh download differs")
+            print("  [OK] fresh download with a matching checksum")
+
+            os.remove(dest)
+            Path(f"{dest}.part").write_bytes(PAYLOAD[:1000])
+            download_file(url, dest, sha256)
+            check(RangeHandler.ranges[-1] == "bytes=1000-", "interrupted download wasn't resumed")
+            check(Path(dest).read_bytes() == PAYLOAD, "resumed download differs")
+            print("  [OK] .part file resumed with a Range request")
+
+            os.remove(dest)
+            Path(f"{dest}.part").write_bytes(PAYLOAD + b"junk")
+            download_file(url, dest, sha256)
+            check(Path(dest).read_bytes() == PAYLOAD, "download after 416 differs")
+            print("  [OK] oversized .part file restarted after 416")
+
+            os.remove(dest)
+            check_raises(Exception, download_file, url, dest, "0" * 64)
+            check(not os.path.exists(dest) and not os.path.exists(f"{dest}.part"), "bad download was kept")
+            print("  [OK] checksum mismatch rejected and removed")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+print("\n" + "="*60)
+print("Testing the PQChub Python wrapper")
+print("="*60)
+
+run("KEM and signature round trips", test_round_trips)
+run("*_into variants", test_into)
+run("Too-small output buffers", test_too_small_buffers)
+run("Batch APIs", test_batches)
+run("Tampered signed messages", test_tampered)
+run("Zero-copy inputs", test_zerocopy)
+run("Async signing and verification", test_async)
+run("Download resume and checksum", test_download)
+
+# Print summary
+print("\n" + "="*60)
+print("Test Summary")
+print("="*60)
+print(f"Tests passed: {tests_passed}")
+print(f"Tests failed: {tests_failed}")
+print(f"Total tests: {tests_passed + tests_failed}")
+
+if tests_failed == 0:
+    print("\n[SUCCESS] All tests passed!")
+    sys.exit(0)
+else:
+    print(f"\n[FAILED] {tests_failed} test(s) failed")
+    sys.exit(1)